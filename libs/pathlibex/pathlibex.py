@@ -12,14 +12,31 @@
 
 from __future__ import annotations
 
+import fnmatch
 import os
 import pathlib
 import re
 import shutil
-from typing import AnyStr, List, Optional, Tuple, Union
+from typing import AnyStr, Callable, Iterator, List, Optional, Tuple, Union
 
 import magic
 
+_DIGITS = re.compile('([0-9]+)')
+
+def natural_key(text: str) -> tuple:
+	'''### natural_key
+	##### Sort key that orders numbers by value, e.g "Track 2" before "Track 10".
+
+	### Args:
+		`text` (str): Name or path to sort by.
+
+	### Returns:
+		tuple: Alternating text and number parts, text first, so keys always compare part by part.
+	'''
+	parts = _DIGITS.split(text)
+	parts[1::2] = map(int, parts[1::2])
+	return tuple(parts)
+
 
 class Path(pathlib.Path):
 	'''
@@ -27,6 +44,7 @@ class Path(pathlib.Path):
 		mostly used internally for my needs, so might be buggy and code is unclean.
 	'''
 	_flavour = pathlib._windows_flavour if os.name == 'nt' else pathlib._posix_flavour
+	_stat_result = None # Cached stat(), see stat() and refresh(), class level as pathlib creates some Paths without calling __init__
 
 	def __new__(cls, *args):
 		return super(Path, cls).__new__(cls, *args)
@@ -34,7 +52,63 @@ class Path(pathlib.Path):
 	def __init__(self, *args):
 		super().__init__()
 		self.ssuffix = self.suffix.lstrip(".")
-		self._some_instance_ppath_value = self.exists()
+
+	def stat(self, *, follow_symlinks=True) -> os.stat_result:
+		'''### stat
+		##### Same as pathlib's stat(), except the result is fetched on first use and then kept,
+		##### so exists(), is_file(), is_dir(), size(), createDate() and modifyDate() share a single stat call.
+		##### Changes made through this Path (touch, write_text, unlink, move, rename, replace, symlink_to, ...) clear it, for other changes call refresh().
+
+		### Returns:
+			os.stat_result: Result of the stat call.
+		'''
+		if not follow_symlinks:
+			return os.stat(self, follow_symlinks=False)
+		if self._stat_result is None:
+			self._stat_result = os.stat(self) # Failures aren't kept, a missing file is looked up again next time.
+		return self._stat_result
+
+	def refresh(self) -> Path:
+		'''### refresh
+		##### Forgets the cached stat result, e.g after the file was changed by something else.
+
+		### Returns:
+			Path: The same Path, e.g path.refresh().size()
+		'''
+		self._stat_result = None
+		return self
+
+	def _scan(self, dirs: bool, extensions=()) -> Iterator[os.DirEntry]:
+		# The directory listing already has the type of each entry on most file systems, so there's no stat per entry,
+		# and the entries only become Paths once they're needed.
+		extensions = tuple(extensions)
+		with os.scandir(self) as it:
+			for entry in it:
+				if (entry.is_dir() if dirs else entry.is_file()) and (not extensions or entry.name.lower().endswith(extensions)):
+					yield entry
+
+	def iterfiles(self, extensions=()) -> Iterator[Path]:
+		'''### iterfiles
+		##### Same as listfiles, except unsorted and one file at a time, e.g for huge directories.
+
+		### Args:
+			`extensions` (tuple, optional): List of extensions to limit listing to, with dot prefix. Defaults to ().
+
+		### Returns:
+			Iterator[Path]: Paths, matching the optionally specificed extension(s), in the order of the file system.
+		'''
+		for entry in self._scan(False, extensions):
+			yield Path(entry.path)
+
+	def iterdirs(self) -> Iterator[Path]:
+		'''### iterdirs
+		##### Same as listdirs, except unsorted and one directory at a time.
+
+		### Returns:
+			Iterator[Path]: Paths, in the order of the file system.
+		'''
+		for entry in self._scan(True):
+			yield Path(entry.path)
 
 	def listfiles(self, extensions=()) -> List[Path]:
 		'''### listfiles
@@ -44,40 +118,99 @@ class Path(pathlib.Path):
 			`extensions` (tuple, optional): List of extensions to limit listing to, with dot prefix. Defaults to ().
 
 		### Returns:
-			List[Path]: List of Paths, matching the optionally specificed extension(s)
+			List[Path]: List of Paths, matching the optionally specificed extension(s), in natural order (see natural_key)
 		'''
-		lst = None
-		if len(extensions) > 0:
-			lst = [self.joinpath(x) for x in self._accessor.listdir(self) if self.joinpath(x).is_file() and x.lower().endswith(extensions)]
-		else:
-			lst = [self.joinpath(x) for x in self._accessor.listdir(self) if self.joinpath(x).is_file()]
+		return [Path(entry.path) for entry in sorted(self._scan(False, extensions), key=lambda entry: natural_key(entry.name))]
 
-		def convert(text):
-			return int(text) if text.isdigit() else text
+	def walk(self, extensions=(), glob: str = None, predicate: Callable[[Path], bool] = None, prune: Callable[[Path], bool] = None,
+		max_depth: int = None, sort: bool = False) -> Iterator[Path]:
+		'''### walk
+		##### Files in this directory and all sub-directories, one at a time while the tree is still being read,
+		##### so huge trees need no more memory than their largest directory.
+		##### Each directory's files come before its sub-directories, symlinked directories aren't followed,
+		##### sub-directories that can't be read are skipped (like os.walk).
 
-		def alphanum_key(key):
-			return [convert(c) for c in re.split('([0-9]+)', str(key))]
+		### Args:
+			`extensions` (tuple, optional): Only files with these extensions, with dot prefix. Defaults to ().
+			`glob` (str, optional): Only files whose name matches this pattern, e.g "*cover*". Defaults to None.
+			`predicate` (Callable[[Path], bool], optional): Only files it returns True for, called after the other filters, its exceptions are passed on. Defaults to None.
+			`prune` (Callable[[Path], bool], optional): Sub-directories it returns True for are skipped, with everything below them. Defaults to None.
+			`max_depth` (int, optional): How many levels of sub-directories to go into, 0 for just this directory. Defaults to None (all).
+			`sort` (bool, optional): Natural order (see natural_key) within each directory, instead of the file system's. Defaults to False.
 
-		lst = sorted(lst, key=alphanum_key)
-		return lst
+		### Returns:
+			Iterator[Path]: Paths of the matching files.
+		'''
+		extensions = tuple(extensions)
+		stack = [(self, 0)]
+		while stack:
+			folder, depth = stack.pop()
+			files = []
+			dirs = []
+			# Only reading the directory is guarded, errors of the predicate (or of the consumer) aren't ours to swallow.
+			try:
+				it = os.scandir(folder)
+			except OSError:
+				if folder is self:
+					raise
+				continue
+			with it:
+				while True:
+					try:
+						entry = next(it, None)
+					except OSError:
+						if folder is self:
+							raise
+						break
+					if entry is None:
+						break
+					try:
+						is_dir = entry.is_dir()
+						is_file = not is_dir and entry.is_file()
+						if is_dir and entry.is_symlink():
+							continue
+					except OSError:
+						continue # e.g removed while listing
+					if is_dir:
+						if max_depth is None or depth < max_depth:
+							dirs.append(entry)
+					elif is_file and (not extensions or entry.name.lower().endswith(extensions)) and (not glob or fnmatch.fnmatch(entry.name, glob)):
+						if sort:
+							files.append(entry)
+						else:
+							path = Path(entry.path)
+							if not predicate or predicate(path):
+								yield path
+
+			if sort:
+				files.sort(key=lambda entry: natural_key(entry.name))
+				dirs.sort(key=lambda entry: natural_key(entry.name))
+			for entry in files:
+				path = Path(entry.path)
+				if not predicate or predicate(path):
+					yield path
+			for entry in reversed(dirs): # The stack is last in, first out.
+				path = Path(entry.path)
+				if not prune or not prune(path):
+					stack.append((path, depth + 1))
 
 	def listall(self, recursive=False) -> List[Path]:
+		'''### listall
+		##### Everything in this directory, files and directories, or with recursive all files in the whole tree, see walk().
 
-		lst = []
-		if all:
-			for r, dirs, files in os.walk(self):
-				for f in files:
-					lst.append(Path(os.path.join(r, f)))
-		else:
-			lst = [self.joinpath(x) for x in self._accessor.listdir(self)]
-
-		def convert(text):
-			return int(text) if text.isdigit() else text
+		### Args:
+			`recursive` (bool, optional): List the files of all sub-directories too. Defaults to False.
 
-		def alphanum_key(key):
-			return [convert(c) for c in re.split('([0-9]+)', str(key))]
+		### Returns:
+			List[Path]: List of Paths, in natural order of the full path (see natural_key)
+		'''
+		if recursive:
+			lst = list(self.walk())
+		else:
+			with os.scandir(self) as it:
+				lst = [Path(entry.path) for entry in it]
 
-		lst = sorted(lst, key=alphanum_key)
+		lst = sorted(lst, key=lambda path: natural_key(str(path)))
 		return lst
 
 	def listdirs(self) -> List[Path]:
@@ -85,9 +218,9 @@ class Path(pathlib.Path):
 		##### Same as listfiles, except for directories only.
 
 		### Returns:
-			List[Path]: List of Path's
+			List[Path]: List of Path's, in natural order (see natural_key)
 		'''
-		return [self.joinpath(x) for x in self._accessor.listdir(self) if self.joinpath(x).is_dir()]
+		return [Path(entry.path) for entry in sorted(self._scan(True), key=lambda entry: natural_key(entry.name))]
 
 	def copy(self, destination: Path) -> Path:
 		'''### copy
@@ -176,6 +309,7 @@ class Path(pathlib.Path):
 		return Path(self.parent.joinpath(self.name + append_str))
 
 	def rmtree(self) -> None:
+		self.refresh()
 		shutil.rmtree(self)
 
 	def size(self) -> int:
@@ -197,6 +331,7 @@ class Path(pathlib.Path):
 		### Returns:
 			Path: The new location of the old Path
 		'''
+		self.refresh()
 		shutil.move(self, destination)
 		return destination
 
@@ -222,6 +357,47 @@ class Path(pathlib.Path):
 
 		return False
 
+	# pathlib's own ways of changing the file, these clear the cached stat result.
+	def touch(self, *args, **kwargs):
+		self.refresh()
+		return super().touch(*args, **kwargs)
+
+	def mkdir(self, *args, **kwargs):
+		self.refresh()
+		return super().mkdir(*args, **kwargs)
+
+	def unlink(self, *args, **kwargs):
+		self.refresh()
+		return super().unlink(*args, **kwargs)
+
+	def rmdir(self):
+		self.refresh()
+		return super().rmdir()
+
+	def chmod(self, *args, **kwargs):
+		self.refresh()
+		return super().chmod(*args, **kwargs)
+
+	def rename(self, target):
+		self.refresh()
+		return super().rename(target)
+
+	def replace(self, target):
+		self.refresh()
+		return super().replace(target)
+
+	def symlink_to(self, *args, **kwargs):
+		self.refresh()
+		return super().symlink_to(*args, **kwargs)
+
+	def hardlink_to(self, target):
+		self.refresh()
+		return super().hardlink_to(target)
+
+	def open(self, *args, **kwargs):
+		self.refresh() # Writes (write_text, write_bytes, ...) all go through open
+		return super().open(*args, **kwargs)
+
 	def joinpath(self, *other):
 		return Path(super().joinpath(*other))
 
@@ -109,6 +109,51 @@ CUSTOM_PLACES = ()
 #
 WHITELISTED_DRIVES = ()
 
+# How often (in seconds) indexing saves its progress to the database,
+# an interrupted run can then be continued with: dfind --index --resume
+#
+# Default: 30
+# Type: Integer
+# Example: 60
+#
+CHECKPOINT_INTERVAL = 30
+
+# Throttled indexing: upper limit of files (stat calls) per second, over all drives together.
+# Also set via --throttle-files, None means no limit.
+#
+# Default: None
+# Type: Integer or None
+# Example: 500
+#
+THROTTLE_FILES_PER_SECOND = None
+
+# Throttled indexing: upper limit of folder listings per second, over all drives together.
+# Also set via --throttle-folders, None means no limit.
+#
+# Default: None
+# Type: Integer or None
+# Example: 50
+#
+THROTTLE_FOLDERS_PER_SECOND = None
+
+# Watch mode: how long the file system has to be quiet (in seconds) before
+# a burst of change notifications gets written to the index in one batch.
+#
+# Default: 2.0
+# Type: Float
+# Example: 0.5
+#
+WATCH_DEBOUNCE = 2.0
+
+# Watch mode: upper limit (in seconds) for how long changes may be held back
+# while the file system keeps on changing, e.g during a long copy.
+#
+# Default: 30.0
+# Type: Float
+# Example: 10.0
+#
+WATCH_MAX_DELAY = 30.0
+
 
 # ########################### CODE ############################
 # #############################################################
@@ -116,20 +161,37 @@ WHITELISTED_DRIVES = ()
 # ################ you know what you're doing   ###############
 # #############################################################
 
+import abc
 import argparse
+import concurrent.futures
+import csv
+import ctypes
+import ctypes.util
 import datetime
+import errno
+import heapq
+import io
+import json
 import math
 import os
 import pathlib
+import queue
+import select
+import socket
 import sqlite3
+import struct
 import sys
 import threading
 import time
-from typing import AnyStr, List
+from typing import AnyStr, Dict, List
 
-import win32.win32api as win32api
 import xxhash
 
+try:
+	import win32.win32api as win32api
+except ImportError: # Only needed to list the drives on Windows, watch mode runs without it.
+	win32api = None
+
 def hashString(s):
 	return xxhash.xxh64(s.encode('utf-8')).hexdigest().upper()
 
@@ -178,6 +240,9 @@ def sanitizeDriveList(l):
 	return [str(x).upper()[0:2] for x in l]
 
 def getDriveRoots(ignoredRoots = (), customPlaces = (), whitelistedDrives=()):
+	if win32api is None:
+		# No drive letters outside of Windows, only CUSTOM_PLACES get indexed.
+		return list(customPlaces)
 	drives = win32api.GetLogicalDriveStrings()
 	drives = drives.split('\000')[:-1]
 	drives = sanitizeDriveList(drives)
@@ -192,7 +257,74 @@ def getDriveRoots(ignoredRoots = (), customPlaces = (), whitelistedDrives=()):
 
 	return drives
 
-def indexDrives(singleThreaded=False):
+def setIdleIoPriority() -> bool:
+	if sys.platform.startswith('linux'):
+		# ioprio_set(IOPRIO_WHO_PROCESS, 0, IOPRIO_CLASS_IDLE), threads started afterwards inherit it.
+		syscallNumbers = {'x86_64': 251, 'aarch64': 30, 'i686': 289, 'i386': 289, 'armv7l': 314}
+		number = syscallNumbers.get(os.uname().machine)
+		if number is None:
+			return False
+		libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+		return libc.syscall(number, 1, 0, 3 << 13) == 0
+	if win32api is not None:
+		import win32.win32process as win32process
+		PROCESS_MODE_BACKGROUND_BEGIN = 0x00100000
+		win32process.SetPriorityClass(win32api.GetCurrentProcess(), PROCESS_MODE_BACKGROUND_BEGIN)
+		return True
+	return False
+
+class IndexThrottle():
+	'''
+		Limits how fast the indexing threads hit the file system, the rates are shared by all of them.
+		On top of that it backs off while the stat latency rises above its usual level,
+		which is a good hint that the file server is busy with more important things.
+	'''
+	MAX_BACKOFF = 32.0
+
+	def __init__(self, filesPerSecond: float = None, foldersPerSecond: float = None, stopEvent: threading.Event = None):
+		self.lock = threading.Lock()
+		self.stopEvent = stopEvent or threading.Event()
+		self.fileInterval = 1.0 / filesPerSecond if filesPerSecond else 0.0
+		self.folderInterval = 1.0 / foldersPerSecond if foldersPerSecond else 0.0
+		self.nextFile = time.monotonic()
+		self.nextFolder = time.monotonic()
+		self.baseLatency = None
+		self.recentLatency = None
+		self.backoff = 1.0
+
+	def __repr__(self):
+		return F'[IndexThrottle] {1 / self.fileInterval if self.fileInterval else "unlimited"} files/s, {1 / self.folderInterval if self.folderInterval else "unlimited"} folders/s, backoff: x{self.backoff:.1f}'
+
+	def file(self) -> None:
+		if self.fileInterval:
+			self.stopEvent.wait(self._reserve('nextFile', self.fileInterval))
+
+	def folder(self) -> None:
+		if self.folderInterval:
+			self.stopEvent.wait(self._reserve('nextFolder', self.folderInterval))
+
+	def _reserve(self, slotName: str, interval: float) -> float:
+		with self.lock:
+			now = time.monotonic()
+			slot = max(getattr(self, slotName), now)
+			setattr(self, slotName, slot + interval * self.backoff)
+			return slot - now
+
+	def observeLatency(self, seconds: float) -> None:
+		with self.lock:
+			if self.baseLatency is None:
+				self.baseLatency = self.recentLatency = seconds
+				return
+			# The base level follows slowly and never with the spikes, the recent level follows quickly.
+			self.baseLatency += 0.002 * (min(seconds, self.baseLatency * 2) - self.baseLatency)
+			self.recentLatency += 0.2 * (seconds - self.recentLatency)
+			ratio = self.recentLatency / self.baseLatency if self.baseLatency > 0 else 1.0
+			if ratio > 2.0:
+				self.backoff = min(self.MAX_BACKOFF, self.backoff * 1.5)
+			elif ratio < 1.25:
+				self.backoff = max(1.0, self.backoff * 0.95)
+
+def indexDrives(singleThreaded=False, resume=False, filesPerSecond=None, foldersPerSecond=None, idleIo=False):
 	def gProgStr(x):
 		progs = ["|", "/", "-", "\\"]
 		if x < 0:
@@ -204,30 +336,57 @@ def indexDrives(singleThreaded=False):
 			rx = x + 1
 		return (rx, progs[x])
 
-	ignoreDrives = sanitizeDriveList(IGNORED_DRIVES)
-	whitelistedDrives = sanitizeDriveList(WHITELISTED_DRIVES)
+	checkpoint = None
+	if resume:
+		if DB_FILE.exists():
+			db = sqlite3.connect(DB_FILE, check_same_thread=False)
+			checkpoint = IndexCheckpoint(db)
+			if not checkpoint.load():
+				checkpoint = None
+				db.close()
+		if checkpoint is None:
+			print(F'No unfinished index run found in {DB_FILE}, starting a new one.')
+
+	if checkpoint is None:
+		ignoreDrives = sanitizeDriveList(IGNORED_DRIVES)
+		whitelistedDrives = sanitizeDriveList(WHITELISTED_DRIVES)
+
+		driveRoots = getDriveRoots(ignoreDrives, CUSTOM_PLACES, whitelistedDrives)
+		if not len(driveRoots):
+			print("There are no drives set to be indexed, please fix your config.")
+			exit(1)
 
-	driveRoots = getDriveRoots(ignoreDrives, CUSTOM_PLACES, whitelistedDrives)
-	if not len(driveRoots):
-		print("There are no drives set to be indexed, please fix your config.")
-		exit(1)
+		if DB_FILE.exists():
+			print(F'Deleting old SQLite DB file: {DB_FILE}')
+			DB_FILE.unlink()
+		db = sqlite3.connect(DB_FILE, check_same_thread=False)
+		c = db.cursor()
+		c.execute('CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY AUTOINCREMENT, drive TEXT, fullpath TEXT, fullpath_hash TEXT, name TEXT, name_hash TEXT, size INTEGER, modify_date TEXT, create_date TEXT);')
+		c.execute('CREATE TABLE IF NOT EXISTS folders (id INTEGER PRIMARY KEY AUTOINCREMENT, fullpath TEXT, fullpath_hash TEXT, name TEXT, name_hash TEXT, size INTEGER, modify_date TEXT, create_date TEXT);')
+		c.execute('CREATE TABLE IF NOT EXISTS info (id INTEGER PRIMARY KEY AUTOINCREMENT, var TEXT, value TEXT);')
+		c.execute(F'INSERT INTO info (var, value) VALUES (?, ?);', ("host", socket.gethostname()))
+		c.close()
+		checkpoint = IndexCheckpoint(db)
+		checkpoint.create(driveRoots)
+	else:
+		driveRoots = checkpoint.drives()
+		print(F'Resuming the index run from its last checkpoint, {checkpoint.pendingCount()} folder(s) left to scan.')
 
+	pendingDrives = [d for d in driveRoots if not checkpoint.isDone(d)]
 	print(F'Indexing all drives ({"Single threaded" if singleThreaded else "Mutli threaded"})')
-	print(F'Drives to be indexed: {", ".join(driveRoots)}')
+	print(F'Drives to be indexed: {", ".join(pendingDrives)}')
+
+	throttle = None
+	if filesPerSecond or foldersPerSecond:
+		throttle = IndexThrottle(filesPerSecond, foldersPerSecond, checkpoint.stopEvent)
+		print(F'Throttled to: {throttle}')
+	if idleIo and not setIdleIoPriority():
+		print("Failed to set the idle I/O priority, continuing with the normal one.")
 
-	if DB_FILE.exists():
-		print(F'Deleting old SQLite DB file: {DB_FILE}')
-		DB_FILE.unlink()
-	db = sqlite3.connect(DB_FILE, check_same_thread=False)
-	c = db.cursor()
-	c.execute('CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY AUTOINCREMENT, drive TEXT, fullpath TEXT, fullpath_hash TEXT, name TEXT, name_hash TEXT, size INTEGER, modify_date TEXT, create_date TEXT);')
-	c.execute('CREATE TABLE IF NOT EXISTS folders (id INTEGER PRIMARY KEY AUTOINCREMENT, fullpath TEXT, fullpath_hash TEXT, name TEXT, name_hash TEXT, size INTEGER, modify_date TEXT, create_date TEXT);')
-	c.execute('CREATE TABLE IF NOT EXISTS info (id INTEGER PRIMARY KEY AUTOINCREMENT, var TEXT, value TEXT);')
-	db.commit()
 	if not singleThreaded:
 		thrList = []
-		for i, d in enumerate(driveRoots):
-			thread = threading.Thread(target=indexSingleDrive, args=(d, db))
+		for i, d in enumerate(pendingDrives):
+			thread = threading.Thread(target=indexSingleDrive, args=(d, checkpoint, throttle))
 			if d.startswith("\\\\"):
 				d = F"@{i}"
 			thrList.append((thread, d))
@@ -251,20 +410,43 @@ def indexDrives(singleThreaded=False):
 				try:
 					time.sleep(0.300)
 				except KeyboardInterrupt:
+					# Let every thread finish the folder it's on, so the checkpoint matches what's in the DB.
+					print("\nInterrupted, saving progress...")
+					checkpoint.stopEvent.set()
+					for thr in thrList:
+						thr[0].join()
+					checkpoint.write()
+					print("Continue later with: dfind --index --resume")
 					exit(1)
 		print("\nFinished indexing")
 	else:
-		for d in driveRoots:
+		for d in pendingDrives:
 			start_time = datetime.datetime.now()
 			print(F'Indexing "{d}"')
-			indexSingleDrive(d, db)
+			try:
+				indexSingleDrive(d, checkpoint, throttle)
+			except KeyboardInterrupt:
+				# Could have been mid-insert, so fall back to the last checkpoint, which is consistent.
+				db.rollback()
+				print("\nInterrupted, progress up to the last checkpoint is saved.")
+				print("Continue later with: dfind --index --resume")
+				exit(1)
 			print(F'Indexing "{d}": Done, took {pretty_time_delta(datetime.datetime.now() - start_time)}')
-	db.commit()
+	checkpoint.write()
+
+	unfinished = [d for d in driveRoots if not checkpoint.isDone(d)]
+	if len(unfinished):
+		print(F'Lost access to: {", ".join(unfinished)}, progress is saved.')
+		print("Continue once they are reachable again with: dfind --index --resume")
+		exit(1)
 
 	# Running another loop on this, since it's only once during indexing
 	# is simpler than having to deal with multithreaded access to the folder dictionary
 
 	print("Calculating sizes...")
+	c = db.cursor()
+	c.execute('DELETE FROM folders;') # Left overs of an interrupted run.
+	c.execute('DELETE FROM info WHERE var = ?;', ("totalSize", ))
 	c.execute('SELECT * FROM files;')
 	c.row_factory = sqlite3.Row
 	folderSizes = {}
@@ -290,47 +472,565 @@ def indexDrives(singleThreaded=False):
 	print("Adding sizes to database...")
 
 	for folder, size in folderSizes.items():
-		p = Path(folder)
-		values = (
-			str(p.resolve()), hashString(str(p.resolve())),
-			p.name if p.name not in ('', None) else str(p.resolve()),
-			hashString(p.name if p.name not in ('', None) else str(p.resolve())),
-			size,
-			p.modifyDate(),
-			p.createDate(),
-		)
-		c.execute(F'INSERT INTO folders (fullpath, fullpath_hash, name, name_hash, size, modify_date, create_date) VALUES (?, ?, ?, ?, ?, ?, ?);', values)
+		c.execute(F'INSERT INTO folders (fullpath, fullpath_hash, name, name_hash, size, modify_date, create_date) VALUES (?, ?, ?, ?, ?, ?, ?);', folderValues(Path(folder), size))
 
 	c.execute(F'INSERT INTO info (var, value) VALUES (?, ?);', ("totalSize", totalSize))
+	print("Creating path index...")
+	createPathIndexes(c)
+	checkpoint.clear()
 	print("Done.")
 	db.commit()
 	c.close()
 	db.close()
 
-def indexSingleDrive(drive, sqlDb):
-	count = 0
-	sqlCursor = sqlDb.cursor()
-	for entry in scantree(drive):
+class IndexCheckpoint():
+	'''
+		Keeps track of the folders that still have to be scanned (the frontier) of every drive
+		and periodically commits it together with the files found so far,
+		so an interrupted index run can be continued with --index --resume.
+	'''
+	def __init__(self, db: sqlite3.Connection, interval: float = CHECKPOINT_INTERVAL):
+		self.db = db
+		self.interval = interval
+		self.lock = threading.Lock()
+		self.stopEvent = threading.Event()
+		self.pending: Dict[str, List[str]] = {}
+		self.inFlight: Dict[str, List[str]] = {}
+		self.done: Dict[str, bool] = {}
+		self.lastWrite = time.monotonic()
+
+	def create(self, driveRoots: List[str]) -> None:
+		c = self.db.cursor()
+		c.execute('CREATE TABLE IF NOT EXISTS index_drives (drive TEXT PRIMARY KEY, done INTEGER);')
+		c.execute('CREATE TABLE IF NOT EXISTS index_frontier (drive TEXT, path TEXT);')
+		c.close()
+		for d in driveRoots:
+			self.pending[d] = [d]
+			self.inFlight[d] = []
+			self.done[d] = False
+		with self.lock:
+			self.write()
+
+	def load(self) -> bool:
+		c = self.db.cursor()
+		if not c.execute('SELECT name FROM sqlite_master WHERE type = ? AND name = ?;', ("table", "index_drives")).fetchone():
+			return False
+		for drive, done in c.execute('SELECT drive, done FROM index_drives;').fetchall():
+			self.pending[drive] = []
+			self.inFlight[drive] = []
+			self.done[drive] = bool(done)
+		for drive, path in c.execute('SELECT drive, path FROM index_frontier;').fetchall():
+			self.pending[drive].append(path)
+		c.close()
+		return len(self.done) > 0
+
+	def drives(self) -> List[str]:
+		return list(self.done.keys())
+
+	def isDone(self, drive: str) -> bool:
+		return self.done[drive]
+
+	def pendingCount(self) -> int:
+		return sum(len(x) for x in self.pending.values())
+
+	def nextFolder(self, drive: str) -> str:
+		with self.lock:
+			if not len(self.pending[drive]):
+				return None
+			folder = self.pending[drive].pop()
+			self.inFlight[drive].append(folder)
+			return folder
+
+	def folderDone(self, drive: str, folder: str, rows: List[tuple], subFolders: List[str]) -> None:
+		with self.lock:
+			self.db.executemany(F'INSERT INTO files (drive, fullpath, fullpath_hash, name, name_hash, size, modify_date, create_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?);', rows)
+			self.inFlight[drive].remove(folder)
+			self.pending[drive].extend(subFolders)
+			if time.monotonic() - self.lastWrite >= self.interval:
+				self.write()
+
+	def folderFailed(self, drive: str, folder: str) -> None:
+		# Keep it in the frontier for the next --resume.
+		with self.lock:
+			self.inFlight[drive].remove(folder)
+			self.pending[drive].append(folder)
+
+	def driveDone(self, drive: str) -> None:
+		with self.lock:
+			self.done[drive] = True
+			self.write()
+
+	def write(self) -> None:
+		# Callers hold self.lock, except at the very end when all indexing threads are gone.
+		c = self.db.cursor()
+		c.execute('DELETE FROM index_frontier;')
+		for drive in self.done:
+			c.execute('INSERT OR REPLACE INTO index_drives (drive, done) VALUES (?, ?);', (drive, int(self.done[drive])))
+			c.executemany('INSERT INTO index_frontier (drive, path) VALUES (?, ?);', [(drive, x) for x in self.pending[drive] + self.inFlight[drive]])
+		self.db.commit()
+		c.close()
+		self.lastWrite = time.monotonic()
+
+	def clear(self) -> None:
+		c = self.db.cursor()
+		c.execute('DROP TABLE IF EXISTS index_frontier;')
+		c.execute('DROP TABLE IF EXISTS index_drives;')
+		c.close()
+
+def scanFolderEntries(drive: str, folder: str, throttle: IndexThrottle = None) -> tuple:
+	rows = []
+	subFolders = []
+	if throttle:
+		throttle.folder()
+	for entry in os.scandir(folder):
+		if entry.is_dir(follow_symlinks=False):
+			# Never index these MS Internal paths
+			if folder == drive and entry.name in ('$RECYCLE.BIN', 'System Volume Information'):
+				continue
+			subFolders.append(entry.path)
+			continue
 		try:
-			if len(entry.parts) >= 2:
-				# Never index these MS Internal paths
-				if entry.parts[1] in ('$RECYCLE.BIN', 'System Volume Information'):
-					continue
-
-			values = (
-				entry.root,
-				str(entry.resolve()), hashString(str(entry.resolve())),
-				entry.name, hashString(entry.name),
-				entry.size(),
-				entry.modifyDate(),
-				entry.createDate(),
-			)
-			sqlCursor.execute(F'INSERT INTO files (drive, fullpath, fullpath_hash, name, name_hash, size, modify_date, create_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?);', values)
-			count += 1
+			if throttle:
+				throttle.file()
+				start_time = time.perf_counter()
+				rows.append(fileValues(Path(entry.path)))
+				throttle.observeLatency(time.perf_counter() - start_time)
+			else:
+				rows.append(fileValues(Path(entry.path)))
 		except (PermissionError, FileNotFoundError, OSError):
 			continue
+	return (rows, subFolders)
+
+def indexSingleDrive(drive: str, checkpoint: IndexCheckpoint, throttle: IndexThrottle = None):
+	while not checkpoint.stopEvent.is_set():
+		folder = checkpoint.nextFolder(drive)
+		if folder is None:
+			checkpoint.driveDone(drive)
+			return
+		try:
+			rows, subFolders = scanFolderEntries(drive, folder, throttle)
+		except (PermissionError, FileNotFoundError):
+			rows, subFolders = [], []
+		except OSError:
+			if not os.path.isdir(drive):
+				# The drive or network share is gone, stop here and leave the rest for --resume.
+				checkpoint.folderFailed(drive, folder)
+				return
+			rows, subFolders = [], []
+		checkpoint.folderDone(drive, folder, rows, subFolders)
+
+def fileValues(entry: Path) -> tuple:
+	return (
+		entry.root,
+		str(entry.resolve()), hashString(str(entry.resolve())),
+		entry.name, hashString(entry.name),
+		entry.size(),
+		entry.modifyDate(),
+		entry.createDate(),
+	)
+
+def folderValues(p: Path, size: int) -> tuple:
+	return (
+		str(p.resolve()), hashString(str(p.resolve())),
+		p.name if p.name not in ('', None) else str(p.resolve()),
+		hashString(p.name if p.name not in ('', None) else str(p.resolve())),
+		size,
+		p.modifyDate(),
+		p.createDate(),
+	)
+
+def createPathIndexes(c):
+	# Plain (binary collated) indexes on the full path, these serve both exact lookups
+	# and the prefix ranges that are used to move or delete whole directories.
+	c.execute('CREATE INDEX IF NOT EXISTS files_fullpath ON files (fullpath);')
+	c.execute('CREATE INDEX IF NOT EXISTS folders_fullpath ON folders (fullpath);')
+
+# ######################### WATCH MODE ########################
+
+class WatchEvent():
+	Path: AnyStr
+	Kind: AnyStr # 'created', 'changed', 'deleted', 'moved_from', 'moved_to' or 'overflow'
+	IsDir: bool
+	Cookie: int
+
+	def __init__(self, path, kind, isDir=False, cookie=0):
+		self.Path = path
+		self.Kind = kind
+		self.IsDir = isDir
+		self.Cookie = cookie
+
+	def __repr__(self):
+		return F'[WatchEvent] {self.Kind} {"folder" if self.IsDir else "file"}: "{self.Path}"'
+
+class WatchBackend(abc.ABC):
+	'''
+		Base class for the file system change notification backends used by "dfind watch".
+		New backends (e.g ReadDirectoryChangesW on Windows) only have to be added to getWatchBackend().
+	'''
+	@abc.abstractmethod
+	def addTree(self, root: str) -> None:
+		pass
+
+	@abc.abstractmethod
+	def readEvents(self, timeout: float = None) -> List[WatchEvent]:
+		pass
 
-	sqlCursor.close()
+	def close(self) -> None:
+		pass
+
+class InotifyWatchBackend(WatchBackend):
+	IN_ATTRIB      = 0x00000004
+	IN_CLOSE_WRITE = 0x00000008
+	IN_MOVED_FROM  = 0x00000040
+	IN_MOVED_TO    = 0x00000080
+	IN_CREATE      = 0x00000100
+	IN_DELETE      = 0x00000200
+	IN_DELETE_SELF = 0x00000400
+	IN_Q_OVERFLOW  = 0x00004000
+	IN_IGNORED     = 0x00008000
+	IN_ONLYDIR     = 0x01000000
+	IN_ISDIR       = 0x40000000
+	IN_CLOEXEC     = 0o2000000
+
+	WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+	EVENT_HEADER = struct.Struct('iIII')
+
+	def __init__(self):
+		self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+		self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+		if self.fd < 0:
+			err = ctypes.get_errno()
+			raise OSError(err, F'inotify_init1 failed: {os.strerror(err)}')
+		self.watches: Dict[int, str] = {}
+		self.movedFrom: Dict[int, str] = {}
+
+	def addWatch(self, path: str) -> None:
+		wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+		if wd < 0:
+			err = ctypes.get_errno()
+			if err == errno.ENOSPC:
+				print(F'Ran out of inotify watches at "{path}", raise fs.inotify.max_user_watches (sysctl) to watch all of it.')
+			return
+		self.watches[wd] = path
+
+	def addTree(self, root: str) -> None:
+		self.addWatch(root)
+		for r, dirs, _ in os.walk(root):
+			for d in dirs:
+				self.addWatch(os.path.join(r, d))
+
+	def removeTree(self, root: str) -> None:
+		# Folders moved out of the watched folders keep their watches (and would keep reporting events), so they're dropped.
+		for wd, path in list(self.watches.items()):
+			if movedPath(path, root, root) is not None:
+				self.libc.inotify_rm_watch(self.fd, wd)
+				del self.watches[wd]
+
+	def movedTree(self, oldRoot: str, newRoot: str) -> None:
+		# The watch descriptors stay valid for renamed folders, only our paths are outdated.
+		for wd, path in self.watches.items():
+			moved = movedPath(path, oldRoot, newRoot)
+			if moved is not None:
+				self.watches[wd] = moved
+
+	def readEvents(self, timeout: float = None) -> List[WatchEvent]:
+		ready, _, _ = select.select([self.fd], [], [], timeout)
+		if not ready:
+			return []
+		buf = os.read(self.fd, 64 * 1024)
+		events = []
+		offset = 0
+		while offset + self.EVENT_HEADER.size <= len(buf):
+			wd, mask, cookie, nameLen = self.EVENT_HEADER.unpack_from(buf, offset)
+			offset += self.EVENT_HEADER.size
+			name = os.fsdecode(buf[offset:offset + nameLen].rstrip(b'\0'))
+			offset += nameLen
+
+			if mask & self.IN_Q_OVERFLOW:
+				events.append(WatchEvent(None, 'overflow'))
+				continue
+			if mask & self.IN_IGNORED:
+				self.watches.pop(wd, None)
+				continue
+			base = self.watches.get(wd)
+			if base is None:
+				continue
+
+			path = os.path.join(base, name) if name else base
+			isDir = bool(mask & self.IN_ISDIR) or bool(mask & self.IN_DELETE_SELF)
+			if mask & self.IN_MOVED_FROM:
+				kind = 'moved_from'
+				if isDir:
+					self.movedFrom[cookie] = path
+			elif mask & self.IN_MOVED_TO:
+				kind = 'moved_to'
+				if cookie in self.movedFrom:
+					# Rename right away, the following events already use the new location.
+					self.movedTree(self.movedFrom.pop(cookie), path)
+				elif isDir:
+					# Moved in from outside, or its moved_from came with an earlier read and the watches were already dropped.
+					self.addTree(path)
+			elif mask & (self.IN_DELETE | self.IN_DELETE_SELF):
+				kind = 'deleted'
+			elif mask & self.IN_CREATE:
+				kind = 'created'
+			else:
+				kind = 'changed'
+			events.append(WatchEvent(path, kind, isDir, cookie))
+
+		# Both halves of a rename come with the same read, a moved_from without its moved_to left the watched folders.
+		for oldPath in self.movedFrom.values():
+			self.removeTree(oldPath)
+		self.movedFrom.clear()
+		return events
+
+	def close(self) -> None:
+		os.close(self.fd)
+
+def getWatchBackend() -> WatchBackend:
+	if sys.platform.startswith('linux'):
+		return InotifyWatchBackend()
+	print(F'Watch mode is not supported on "{sys.platform}" yet, only inotify (Linux) is implemented.')
+	exit(1)
+
+def movedPath(path: str, oldRoot: str, newRoot: str) -> str:
+	if path == oldRoot:
+		return newRoot
+	if path.startswith(oldRoot.rstrip(os.sep) + os.sep):
+		return newRoot + path[len(oldRoot):]
+	return None
+
+def prefixRange(path: str) -> tuple:
+	# Everything below path sorts between "path/" and "path0" ('0' being the character after '/'),
+	# so the fullpath indexes can be used for whole sub trees.
+	prefix = path.rstrip(os.sep) + os.sep
+	return (prefix, prefix[:-1] + chr(ord(os.sep) + 1))
+
+class WatchBatch():
+	'''
+		Coalesces a burst of WatchEvents, the last action per path wins.
+		Moves are kept in order since they rewrite what's already in the index,
+		every other action re-reads the file system once the batch gets applied.
+	'''
+	def __init__(self):
+		self.steps = []
+		self.actions = {}
+		self.pendingMoves = {}
+		self.eventCount = 0
+		self.firstEvent = None
+		self.lastEvent = None
+
+	def __len__(self):
+		return self.eventCount
+
+	def add(self, event: WatchEvent) -> None:
+		now = time.monotonic()
+		if self.firstEvent is None:
+			self.firstEvent = now
+		self.lastEvent = now
+		self.eventCount += 1
+
+		if event.Kind == 'moved_from':
+			self.pendingMoves[event.Cookie] = event.Path
+		elif event.Kind == 'moved_to':
+			source = self.pendingMoves.pop(event.Cookie, None)
+			if source is None:
+				# Moved in from somewhere we don't watch, so this is new content.
+				self.actions[event.Path] = 'scan' if event.IsDir else 'upsert'
+			else:
+				self.addMove(source, event.Path, event.IsDir)
+		elif event.Kind == 'deleted':
+			self.actions[event.Path] = 'delete'
+		elif event.Kind == 'created' and event.IsDir:
+			self.actions[event.Path] = 'scan'
+		elif not event.IsDir and self.actions.get(event.Path) != 'scan':
+			self.actions[event.Path] = 'upsert'
+
+	def addMove(self, oldPath: str, newPath: str, isDir: bool) -> None:
+		# Pending updates below the old path now live below the new one,
+		# deletes stay in front of the move since they refer to the old tree.
+		carried = {}
+		for path, action in list(self.actions.items()):
+			moved = movedPath(path, oldPath, newPath)
+			if moved is not None and action != 'delete':
+				carried[moved] = action
+				del self.actions[path]
+		self.steps.append(('actions', self.actions))
+		self.steps.append(('move', (oldPath, newPath, isDir)))
+		self.actions = carried
+
+	def rescan(self, roots: List[str]) -> None:
+		for root in roots:
+			self.actions[root] = 'scan'
+		self.eventCount += 1
+
+	def secondsUntilDue(self, debounce: float, maxDelay: float) -> float:
+		if not self.eventCount:
+			return None
+		due = min(self.lastEvent + debounce, self.firstEvent + maxDelay)
+		return max(0.0, due - time.monotonic())
+
+	def allSteps(self) -> List[tuple]:
+		actions = dict(self.actions)
+		for path in self.pendingMoves.values():
+			# Moved out of the watched folders.
+			actions.setdefault(path, 'delete')
+		return self.steps + [('actions', actions)]
+
+class IndexWatcher():
+	'''
+		Applies WatchBatches to the index DB, keeping the folder sizes and the total size in sync.
+	'''
+	def __init__(self, db: sqlite3.Connection, backend: WatchBackend):
+		self.db = db
+		self.backend = backend
+		self.db.create_function('hashString', 1, hashString, deterministic=True)
+
+	def apply(self, batch: WatchBatch) -> None:
+		c = self.db.cursor()
+		for kind, step in batch.allSteps():
+			if kind == 'move':
+				self.movePath(c, *step)
+				continue
+			for path, action in step.items():
+				try:
+					if action == 'delete':
+						self.deletePath(c, path)
+					elif action == 'scan':
+						self.scanFolder(c, path)
+					else:
+						self.upsertFile(c, path)
+				except (PermissionError, FileNotFoundError, OSError):
+					continue
+		self.db.commit()
+		c.close()
+
+	def addFolderSize(self, c, folder: str, delta: int) -> None:
+		if c.execute('UPDATE folders SET size = size + ? WHERE fullpath = ?;', (delta, folder)).rowcount == 0 and delta >= 0:
+			try:
+				c.execute(F'INSERT INTO folders (fullpath, fullpath_hash, name, name_hash, size, modify_date, create_date) VALUES (?, ?, ?, ?, ?, ?, ?);', folderValues(Path(folder), delta))
+			except OSError:
+				pass
+
+	def addTotalSize(self, c, delta: int) -> None:
+		if delta:
+			c.execute('UPDATE info SET value = value + ? WHERE var = ?;', (delta, "totalSize"))
+
+	def deletePath(self, c, path: str) -> None:
+		row = c.execute('SELECT size FROM files WHERE fullpath = ?;', (path, )).fetchone()
+		if row:
+			c.execute('DELETE FROM files WHERE fullpath = ?;', (path, ))
+			self.addFolderSize(c, os.path.dirname(path), -row[0])
+			self.addTotalSize(c, -row[0])
+
+		low, high = prefixRange(path)
+		removed = c.execute('SELECT COALESCE(SUM(size), 0) FROM files WHERE fullpath >= ? AND fullpath < ?;', (low, high)).fetchone()[0]
+		c.execute('DELETE FROM files WHERE fullpath >= ? AND fullpath < ?;', (low, high))
+		c.execute('DELETE FROM folders WHERE fullpath = ? OR (fullpath >= ? AND fullpath < ?);', (path, low, high))
+		self.addTotalSize(c, -removed)
+
+	def upsertFile(self, c, path: str) -> None:
+		entry = Path(path)
+		if entry.is_dir():
+			self.scanFolder(c, path)
+			return
+		if not entry.is_file():
+			self.deletePath(c, path)
+			return
+
+		values = fileValues(entry)
+		fullpath = values[1]
+		old = c.execute('SELECT size FROM files WHERE fullpath = ?;', (fullpath, )).fetchone()
+		if old:
+			c.execute('UPDATE files SET size = ?, modify_date = ?, create_date = ? WHERE fullpath = ?;', (values[5], values[6], values[7], fullpath))
+		else:
+			# Might have been a folder before.
+			self.deletePath(c, fullpath)
+			c.execute(F'INSERT INTO files (drive, fullpath, fullpath_hash, name, name_hash, size, modify_date, create_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?);', values)
+		delta = values[5] - (old[0] if old else 0)
+		self.addFolderSize(c, os.path.dirname(fullpath), delta)
+		self.addTotalSize(c, delta)
+
+	def scanFolder(self, c, path: str) -> None:
+		# Only ever called for folders that are new to us, everything else is handled incrementally.
+		self.backend.addTree(path)
+		self.deletePath(c, path)
+		folderSizes = {}
+		totalSize = 0
+		for entry in scantree(path):
+			try:
+				values = fileValues(entry)
+			except (PermissionError, FileNotFoundError, OSError):
+				continue
+			c.execute(F'INSERT INTO files (drive, fullpath, fullpath_hash, name, name_hash, size, modify_date, create_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?);', values)
+			folder = os.path.dirname(values[1])
+			folderSizes[folder] = folderSizes.get(folder, 0) + values[5]
+			totalSize += values[5]
+		for folder, size in folderSizes.items():
+			self.addFolderSize(c, folder, size)
+		self.addTotalSize(c, totalSize)
+
+	def movePath(self, c, oldPath: str, newPath: str, isDir: bool) -> None:
+		# A rename replaces whatever was at the target.
+		self.deletePath(c, newPath)
+		if isDir:
+			low, high = prefixRange(oldPath)
+			for table in ('files', 'folders'):
+				c.execute(
+					F'UPDATE {table} SET fullpath = ? || substr(fullpath, ?), fullpath_hash = hashString(? || substr(fullpath, ?)) '
+					'WHERE fullpath >= ? AND fullpath < ?;',
+					(newPath, len(oldPath) + 1, newPath, len(oldPath) + 1, low, high)
+				)
+			name = os.path.basename(newPath)
+			c.execute('UPDATE folders SET fullpath = ?, fullpath_hash = ?, name = ?, name_hash = ? WHERE fullpath = ?;', (newPath, hashString(newPath), name, hashString(name), oldPath))
+			return
+
+		row = c.execute('SELECT size FROM files WHERE fullpath = ?;', (oldPath, )).fetchone()
+		if row is None:
+			self.upsertFile(c, newPath)
+			return
+		name = os.path.basename(newPath)
+		c.execute('UPDATE files SET fullpath = ?, fullpath_hash = ?, name = ?, name_hash = ? WHERE fullpath = ?;', (newPath, hashString(newPath), name, hashString(name), oldPath))
+		self.addFolderSize(c, os.path.dirname(oldPath), -row[0])
+		self.addFolderSize(c, os.path.dirname(newPath), row[0])
+
+def watch(paths: List[str], debounce: float = WATCH_DEBOUNCE, maxDelay: float = WATCH_MAX_DELAY):
+	roots = [os.path.realpath(p) for p in paths]
+	for root in roots:
+		if not os.path.isdir(root):
+			print(F'"{root}" is not a folder.')
+			exit(1)
+
+	backend = getWatchBackend()
+	db = sqlite3.connect(DB_FILE)
+	createPathIndexes(db.cursor())
+	db.commit()
+	watcher = IndexWatcher(db, backend)
+	for root in roots:
+		backend.addTree(root)
+	print(F'Watching for changes in: {", ".join(roots)} (Ctrl+C to stop)')
+
+	batch = WatchBatch()
+	try:
+		while True:
+			for event in backend.readEvents(batch.secondsUntilDue(debounce, maxDelay)):
+				if event.Kind == 'overflow':
+					print("Too many changes at once, the kernel dropped some, rescanning the watched folders.")
+					batch.rescan(roots)
+				else:
+					batch.add(event)
+			if len(batch) and batch.secondsUntilDue(debounce, maxDelay) == 0:
+				start_time = time.time()
+				watcher.apply(batch)
+				print(F'Applied {len(batch)} change(s) to the index, took {pretty_time_delta(time.time() - start_time)}')
+				batch = WatchBatch()
+	except KeyboardInterrupt:
+		if len(batch):
+			watcher.apply(batch)
+		print("\nStopped watching.")
+	finally:
+		backend.close()
+		db.close()
 
 def top(top_type, top_max, ascending):
 	db = sqlite3.connect(F'file:{DB_FILE}?mode=ro', uri=True)
@@ -341,10 +1041,43 @@ def top(top_type, top_max, ascending):
 	for i, row in enumerate(c.fetchall(), 1):
 		print(F'#{i:2}: {sizeToIECString(row["size"]):>15}  -  {row["fullpath"]}')
 
-def find(search: str, noWildcard = False, case_sensitive = False) -> DFindResultList:
+def find(search: str, noWildcard = False, case_sensitive = False, indexFiles: List[str] = None) -> DFindResultList:
 	start_time = time.time()
 	search = search.replace('*', '%')
-	db = sqlite3.connect(F'file:{DB_FILE}?mode=ro', uri=True)
+	if not indexFiles:
+		indexFiles = [DB_FILE]
+
+	if len(indexFiles) == 1:
+		rlist, query = queryIndex(indexFiles[0], search, noWildcard, case_sensitive)
+	else:
+		# Federated search: every index file gets its own connection, so the queries
+		# actually run in parallel (sqlite3 releases the GIL while stepping), the results
+		# come back sorted by path and are merged in order.
+		with concurrent.futures.ThreadPoolExecutor(max_workers=len(indexFiles)) as pool:
+			results = list(pool.map(lambda f: queryIndex(f, search, noWildcard, case_sensitive, ordered=True), indexFiles))
+		rlist = list(heapq.merge(*[x[0] for x in results], key=lambda x: (x.FullPath, x.Host or '')))
+		query = results[0][1]
+
+	took = time.time() - start_time
+
+	tookStr = pretty_time_delta(took)
+
+	r = DFindResultList()
+	r.List = rlist
+	r.Count = len(rlist)
+	r.TookStr = tookStr
+	r.Took = took
+	r.CaseSensitive = case_sensitive
+	r.Wildcard = not noWildcard
+	r.OriginalSearch = search
+	r.Query = query
+	r.Hosts = sorted(set(x.Host for x in rlist if x.Host))
+
+	return r
+
+def queryIndex(indexFile: str, search: str, noWildcard = False, case_sensitive = False, ordered = False) -> tuple:
+	db = sqlite3.connect(F'file:{indexFile}?mode=ro', uri=True)
+	host = indexHost(db, indexFile)
 	c = db.cursor()
 
 	queryStr = {"query": None}
@@ -354,51 +1087,230 @@ def find(search: str, noWildcard = False, case_sensitive = False) -> DFindResult
 
 	db.set_trace_callback(rawQuery)
 
+	where, args = searchClause(search, noWildcard)
+	orderBy = " ORDER BY fullpath" if ordered else ""
 	if case_sensitive:
 		c.execute('PRAGMA case_sensitive_like = on;')
-	if noWildcard:
-		c.execute('SELECT * FROM files WHERE name = ? OR fullpath = ?;', (search, search))
-	else:
-		c.execute('SELECT * FROM files WHERE name LIKE ? OR fullpath LIKE ?;', (search, search))
+	c.execute(F'SELECT * FROM files{where}{orderBy};', args)
 
 	c.row_factory = sqlite3.Row
 
 	db.set_trace_callback(None)
 
-	def format_row(_row):
-		ro = DFindResult()
-		_row = dict(zip(_row.keys(), _row))
-		ro.Id = _row['id']
-		ro.Drive = _row['drive']
-		ro.FullPath = _row['fullpath']
-		ro.FullPathHash = _row['fullpath_hash']
-		ro.Name = _row['name']
-		ro.NameHash = _row['name_hash']
-		ro.Size = _row['size']
-		ro.ModifyDate = _row['modify_date']
-		ro.CreateDate = _row['create_date']
-		return ro
-
-	rlist = [format_row(row) for row in c.fetchall()]
+	rlist = [rowToResult(row, host) for row in c.fetchall()]
 
-	took = time.time() - start_time
+	c.close()
+	db.close()
 
-	tookStr = pretty_time_delta(took)
+	return (rlist, queryStr["query"])
 
-	r = DFindResultList()
-	r.List = rlist
-	r.Count = len(rlist)
-	r.TookStr = tookStr
-	r.Took = took
-	r.CaseSensitive = case_sensitive
-	r.Wildcard = not noWildcard
-	r.OriginalSearch = search
-	r.Query = queryStr["query"]
-	
+def searchClause(search: str, noWildcard = False) -> tuple:
+	if search is None:
+		return ('', ())
+	if noWildcard:
+		return (' WHERE name = ? OR fullpath = ?', (search, search))
+	return (' WHERE name LIKE ? OR fullpath LIKE ?', (search, search))
+
+EXPORT_COLUMNS = ('host', 'drive', 'fullpath', 'name', 'size', 'modify_date', 'create_date')
+EXPORT_FORMATS = ('ndjson', 'csv', 'tsv', 'null-delimited')
+
+def iterIndexRows(indexFile: str, table: str = 'files', search: str = None, noWildcard = False, case_sensitive = False, ordered = False, batchSize: int = 10000):
+	'''
+		Yields the EXPORT_COLUMNS of every matching row as tuple, straight from the cursor (in batches of batchSize),
+		so it never holds more than that in memory.
+	'''
+	db = sqlite3.connect(F'file:{indexFile}?mode=ro', uri=True)
+	try:
+		host = indexHost(db, indexFile)
+		hostColumn, hostArgs = ('host', ()) if host is None else ('?', (host, ))
+		driveColumn = 'drive' if table == 'files' else 'NULL'
+		where, args = searchClause(search, noWildcard)
+		orderBy = " ORDER BY fullpath" if ordered else ""
+		c = db.cursor()
+		if case_sensitive:
+			c.execute('PRAGMA case_sensitive_like = on;')
+		c.execute(F'SELECT {hostColumn}, {driveColumn}, fullpath, name, size, modify_date, create_date FROM {table}{where}{orderBy};', hostArgs + args)
+		while True:
+			rows = c.fetchmany(batchSize)
+			if not rows:
+				break
+			yield from rows
+	finally:
+		db.close()
+
+def iterInThread(iterable, maxQueued: int = 10000):
+	'''Runs iterable in its own thread, with at most maxQueued items waiting to be consumed.'''
+	items = queue.Queue(maxQueued)
+	end = object()
+
+	def produce():
+		try:
+			for item in iterable:
+				items.put(item)
+		except Exception as e:
+			items.put(e)
+		items.put(end)
+
+	threading.Thread(target=produce, daemon=True).start()
+	while True:
+		item = items.get()
+		if item is end:
+			return
+		if isinstance(item, Exception):
+			raise item
+		yield item
+
+def iterIndexesRows(indexFiles: List[str], table: str = 'files', search: str = None, noWildcard = False, case_sensitive = False):
+	if len(indexFiles) == 1:
+		yield from iterIndexRows(indexFiles[0], table, search, noWildcard, case_sensitive)
+		return
+	# Same as find(): every index file is read in parallel, in path order, and merged on the fly.
+	streams = [iterInThread(iterIndexRows(f, table, search, noWildcard, case_sensitive, ordered=True)) for f in indexFiles]
+	yield from heapq.merge(*streams, key=lambda x: (x[2], x[0] or ''))
+
+TSV_ESCAPES = str.maketrans({'\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def tsvField(value) -> str:
+	# Only what would break the lines/columns is escaped, backslashes stay as they are (Windows paths), so cut/sort/xargs get real paths.
+	return '' if value is None else str(value).translate(TSV_ESCAPES)
+
+def writeRows(rows, outputFormat: str, out) -> int:
+	'''
+		Writes rows (EXPORT_COLUMNS tuples) to the binary stream out, returns the number of rows written.
+		null-delimited only writes the full paths, e.g for xargs -0.
+	'''
+	count = 0
+	if outputFormat == 'null-delimited':
+		for row in rows:
+			out.write(row[2].encode('utf-8', 'surrogateescape') + b'\0')
+			count += 1
+	elif outputFormat == 'ndjson':
+		for row in rows:
+			out.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False).encode('utf-8', 'surrogateescape') + b'\n')
+			count += 1
+	else:
+		text = io.TextIOWrapper(out, encoding='utf-8', errors='surrogateescape', newline='', write_through=True)
+		if outputFormat == 'tsv':
+			text.write('\t'.join(EXPORT_COLUMNS) + '\n')
+			for row in rows:
+				text.write('\t'.join(map(tsvField, row)) + '\n')
+				count += 1
+		else:
+			writer = csv.writer(text, lineterminator='\n')
+			writer.writerow(EXPORT_COLUMNS)
+			for row in rows:
+				writer.writerow(row)
+				count += 1
+		text.detach()
+	return count
+
+def exportRows(rows, outputFormat: str, outputFile: str = None, bufferSize: int = 1024 * 1024) -> int:
+	if outputFile:
+		out = open(outputFile, 'wb', buffering=bufferSize)
+	else:
+		out = open(sys.stdout.fileno(), 'wb', buffering=bufferSize, closefd=False)
+	try:
+		count = writeRows(rows, outputFormat, out)
+		out.flush()
+	except BrokenPipeError:
+		# Whatever we were piped into (e.g head) has seen enough.
+		os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+		return -1
+	finally:
+		if outputFile:
+			out.close()
+	return count
+
+def rowToResult(_row, host: str = None) -> DFindResult:
+	ro = DFindResult()
+	_row = dict(zip(_row.keys(), _row))
+	ro.Id = _row['id']
+	ro.Host = _row.get('host', host)
+	ro.Drive = _row['drive']
+	ro.FullPath = _row['fullpath']
+	ro.FullPathHash = _row['fullpath_hash']
+	ro.Name = _row['name']
+	ro.NameHash = _row['name_hash']
+	ro.Size = _row['size']
+	ro.ModifyDate = _row['modify_date']
+	ro.CreateDate = _row['create_date']
+	return ro
+
+def tableColumns(db: sqlite3.Connection, table: str, schema: str = 'main') -> List[str]:
+	return [x[1] for x in db.execute(F'PRAGMA {schema}.table_info({table});').fetchall()]
+
+def indexHost(db: sqlite3.Connection, indexFile: str, schema: str = 'main') -> str:
+	'''
+		The host an index file belongs to, None for merged index files, which have a host per row.
+		Index files from before the host was recorded fall back to their file name.
+	'''
+	if 'host' in tableColumns(db, 'files', schema):
+		return None
+	row = db.execute(F'SELECT value FROM {schema}.info WHERE var = ?;', ("host", )).fetchone()
+	if row:
+		return row[0]
+	return Path(indexFile).stem
+
+def mergeIndexes(outputFile: str, inputFiles: List[str]):
+	start_time = time.time()
+	db = sqlite3.connect(outputFile)
+	columns = tableColumns(db, 'files')
+	if columns and 'host' not in columns:
+		# A normal index has no host column, merging into it would mix the rows of several hosts with its own.
+		print(F'"{outputFile}" is the index of a single host, the output has to be a new or a merged index file.')
+		db.close()
+		exit(1)
+	c = db.cursor()
+	c.execute('CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY AUTOINCREMENT, host TEXT, drive TEXT, fullpath TEXT, fullpath_hash TEXT, name TEXT, name_hash TEXT, size INTEGER, modify_date TEXT, create_date TEXT);')
+	c.execute('CREATE TABLE IF NOT EXISTS folders (id INTEGER PRIMARY KEY AUTOINCREMENT, host TEXT, fullpath TEXT, fullpath_hash TEXT, name TEXT, name_hash TEXT, size INTEGER, modify_date TEXT, create_date TEXT);')
+	c.execute('CREATE TABLE IF NOT EXISTS info (id INTEGER PRIMARY KEY AUTOINCREMENT, var TEXT, value TEXT);')
+	c.execute('CREATE UNIQUE INDEX IF NOT EXISTS files_host_fullpath ON files (host, fullpath);')
+	c.execute('CREATE UNIQUE INDEX IF NOT EXISTS folders_host_fullpath ON folders (host, fullpath);')
+
+	fileColumns = 'drive, fullpath, fullpath_hash, name, name_hash, size, modify_date, create_date'
+	folderColumns = 'fullpath, fullpath_hash, name, name_hash, size, modify_date, create_date'
+	replacedHosts = set()
+
+	for inputFile in inputFiles:
+		if not os.path.isfile(inputFile):
+			print(F'Index file "{inputFile}" does not exist.')
+			exit(1)
+		c.execute('ATTACH DATABASE ? AS src;', (F'file:{inputFile}?mode=ro', ))
+		if c.execute('SELECT name FROM src.sqlite_master WHERE type = ? AND name = ?;', ("table", "index_drives")).fetchone():
+			print(F'Warning: "{inputFile}" is from an unfinished index run, merging what is there.')
+
+		host = indexHost(db, inputFile, 'src')
+		if host is None:
+			hosts = [x[0] for x in c.execute('SELECT DISTINCT host FROM src.files;').fetchall()]
+			hostColumn = 'host'
+			hostArgs = ()
+		else:
+			hosts = [host]
+			hostColumn = '?'
+			hostArgs = (host, )
+
+		# Every input holds the complete index of its host(s), so drop what an earlier merge had for them,
+		# otherwise files deleted on the host would stay in here forever.
+		for h in hosts:
+			if h not in replacedHosts:
+				c.execute('DELETE FROM files WHERE host = ?;', (h, ))
+				c.execute('DELETE FROM folders WHERE host = ?;', (h, ))
+				replacedHosts.add(h)
+
+		c.execute(F'INSERT OR REPLACE INTO files (host, {fileColumns}) SELECT {hostColumn}, {fileColumns} FROM src.files;', hostArgs)
+		print(F'Merged {c.rowcount} files of {", ".join(str(h) for h in hosts)} from: {inputFile}')
+		c.execute(F'INSERT OR REPLACE INTO folders (host, {folderColumns}) SELECT {hostColumn}, {folderColumns} FROM src.folders;', hostArgs)
+		db.commit()
+		c.execute('DETACH DATABASE src;')
+
+	totalSize = c.execute('SELECT COALESCE(SUM(size), 0) FROM files;').fetchone()[0]
+	c.execute('DELETE FROM info WHERE var = ?;', ("totalSize", ))
+	c.execute(F'INSERT INTO info (var, value) VALUES (?, ?);', ("totalSize", totalSize))
+	createPathIndexes(c)
+	db.commit()
 	c.close()
 	db.close()
-
-	return r
+	print(F'Done, took {pretty_time_delta(time.time() - start_time)}')
 
 def showUi(rl: DFindResultList):
 	if rl.Count <= 0:
@@ -433,12 +1345,14 @@ class DFindResultList():
 	CaseSensitive: bool
 	Wildcard: bool
 	Query: str
+	Hosts: List[str]
 
 	def __repr__(self):
 		return F'[DFindResultList] Search for: "{self.OriginalSearch}"; Count: {self.Count}, Took: {self.TookStr}, {"Case-Sensitive" if self.CaseSensitive else "Case-Insensitive"} {"Wildcard" if self.Wildcard else "Exact"} Match'
 
 class DFindResult():
 	Id: int
+	Host: AnyStr
 	Drive: AnyStr
 	FullPath: AnyStr
 	FullPathHash: AnyStr
@@ -474,7 +1388,7 @@ if __name__ == '__main__':
 	def printResutls(results: DFindResultList):
 		if results.Count > 0:
 			for x in results.List:
-				print(x.FullPath)
+				print(F'{x.Host}:{x.FullPath}' if x.Host and len(results.Hosts) > 1 else x.FullPath)
 		else:
 			print(F"Error: Found nothing for: '{results.OriginalSearch}', maybe try re-indexing via the argument: --index")
 			exit(1)
@@ -497,14 +1411,21 @@ if __name__ == '__main__':
 		dest='index', action='store_true', default=False
 	)
 	parser.add_argument('-n', '--single-threaded', help='Single threaded indexing? (Default: no)', dest='singleThreaded', action='store_true', default=False)
+	parser.add_argument('--throttle-files', help='Low impact indexing: at most this many files per second (Default: no limit)', dest='filesPerSecond', type=float, default=THROTTLE_FILES_PER_SECOND)
+	parser.add_argument('--throttle-folders', help='Low impact indexing: at most this many folder listings per second (Default: no limit)', dest='foldersPerSecond', type=float, default=THROTTLE_FOLDERS_PER_SECOND)
+	parser.add_argument('--idle-io', help='Index with idle I/O priority, Linux: ioprio idle class, Windows: background mode (Default: no)', dest='idleIo', action='store_true', default=False)
+	parser.add_argument('-r', '--resume', help='Continue an interrupted --index run from its last checkpoint (Default: no)', dest='resume', action='store_true', default=False)
 
 	sps = parser.add_subparsers(help="Sub commands")
 
 	sp = sps.add_parser("search", help="Search the database\nType: \"" + parser.prog + " plain --help\" for more help")
+	sp.set_defaults(which="search")
 	sp.add_argument('search', nargs="?")
+	sp.add_argument('-f', '--federate', help='Search these index files (e.g from other machines) in parallel instead of the local one, can be given multiple times', dest='indexFiles', action='append', default=None)
 	sp.add_argument('-e', '--exact-match', help='Do not use wildcard search (default: yes)', dest='noWildCard', action='store_true', default=False)
 	sp.add_argument('-c', '--case-sensitive', help='Search case-sensitively (default: no)', dest='caseSensitive', action='store_true', default=False)
 	sp.add_argument('-u', '--with-ui', help='Show UI with search results (default: yes)', dest='withUi', action='store_true', default=False)
+	sp.add_argument('--format', help='Stream the results in this format instead of printing the paths', choices=EXPORT_FORMATS, dest='format', default=None)
 
 	sp = sps.add_parser("top", help="Shows the top files and folders in terms of Size\nType: \"" + parser.prog + " plain --help\" for more help")
 	sp.set_defaults(which="top_p")
@@ -512,12 +1433,29 @@ if __name__ == '__main__':
 	sp.add_argument("-m", "--max-results", help="The amount of items to show", type=int, choices=range(1,101), dest="max", default=10)
 	sp.add_argument("-a", "--ascending", help="Wether to sort asecnding (smallest first)", action='store_true', dest="asc", default=False)
 
+	sp = sps.add_parser("merge", help="Merge the index files of several machines into one\nType: \"" + parser.prog + " merge --help\" for more help")
+	sp.set_defaults(which="merge_p")
+	sp.add_argument("output", help="Index file to merge into, files of the same host and path are only kept once")
+	sp.add_argument("inputs", help="Index files to merge", nargs="+")
+
+	sp = sps.add_parser("export", help="Stream the whole index (or a table of it)\nType: \"" + parser.prog + " export --help\" for more help")
+	sp.set_defaults(which="export_p")
+	sp.add_argument("-t", "--type", help="Wether to export folders or files", choices=("folders", "files"), dest="type", default="files")
+	sp.add_argument('--format', help='Output format (Default: ndjson)', choices=EXPORT_FORMATS, dest='format', default='ndjson')
+	sp.add_argument("-o", "--output", help="File to write to (Default: stdout)", dest="output", default=None)
+	sp.add_argument('-f', '--federate', help='Export these index files instead of the local one, can be given multiple times', dest='indexFiles', action='append', default=None)
+
+	sp = sps.add_parser("watch", help="Keep the index up to date by watching folders for changes (Linux only)\nType: \"" + parser.prog + " watch --help\" for more help")
+	sp.set_defaults(which="watch_p")
+	sp.add_argument("paths", help="Folders to watch, these should already be part of the index", nargs="+")
+	sp.add_argument("-d", "--debounce", help=F"Seconds of quiet before a burst of changes gets written to the index (Default: {WATCH_DEBOUNCE})", type=float, dest="debounce", default=WATCH_DEBOUNCE)
+
 	# ###
 	# Comprimise, either use this unreliable and imperfect dirty hack or
 	# require a sub-parser or argument for searches
 	# the latter is a far bigger burden to me.
 	#
-	if len(sys.argv) >= 2 and sys.argv[1] not in ("search", "top") and not sys.argv[1].startswith("-"):
+	if len(sys.argv) >= 2 and sys.argv[1] not in ("search", "top", "merge", "export", "watch") and not sys.argv[1].startswith("-"):
 		printResutls(find(" ".join(sys.argv[1:]), False, False))
 		exit()
 	# ####
@@ -525,10 +1463,14 @@ if __name__ == '__main__':
 	args = parser.parse_args()
 
 	if args.index:
-		indexDrives(args.singleThreaded)
+		indexDrives(args.singleThreaded, args.resume, args.filesPerSecond, args.foldersPerSecond, args.idleIo)
+		exit(0)
+
+	if args.which == "merge_p":
+		mergeIndexes(args.output, args.inputs)
 		exit(0)
 
-	if not DB_FILE.exists():
+	if not DB_FILE.exists() and not (args.which in ("search", "export_p") and args.indexFiles):
 		print("No index DB found, please create one using the command:")
 		print("dfind index")
 		exit(1)
@@ -537,10 +1479,21 @@ if __name__ == '__main__':
 		if not args.search:
 			parser.print_help()
 			exit(1)
-		if args.withUi:
-			showUi(find(args.search, args.noWildCard, args.caseSensitive))
+		if args.format:
+			rows = iterIndexesRows(args.indexFiles or [DB_FILE], 'files', args.search.replace('*', '%'), args.noWildCard, args.caseSensitive)
+			if exportRows(rows, args.format) == 0:
+				print(F"Error: Found nothing for: '{args.search}', maybe try re-indexing via the argument: --index", file=sys.stderr)
+				exit(1)
+		elif args.withUi:
+			showUi(find(args.search, args.noWildCard, args.caseSensitive, args.indexFiles))
 		else:
-			printResutls(find(args.search, args.noWildCard, args.caseSensitive))
+			printResutls(find(args.search, args.noWildCard, args.caseSensitive, args.indexFiles))
 
 	elif args.which == "top_p":
-		top(args.type, args.max, args.asc)
\ No newline at end of file
+		top(args.type, args.max, args.asc)
+
+	elif args.which == "export_p":
+		exportRows(iterIndexesRows(args.indexFiles or [DB_FILE], args.type), args.format, args.output)
+
+	elif args.which == "watch_p":
+		watch(args.paths, args.debounce)
\ No newline at end of file
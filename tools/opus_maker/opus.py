@@ -28,11 +28,19 @@ from __future__ import annotations
 # to clip-board (if pyperclip is installed)
 #
 # Syntax/Usage:
-#   opus <file> [<start_time> [<end_time]]
+#   opus [-j <jobs>] [-e <engine>] [-r] [-f] [-s] [--renditions <kbps,...>] [-c <start-end>]... [--clips <file>] [--report <path>] <file or folder> [<start_time> [<end_time]]
+#   opus watch [-j <jobs>] [-r] <folder>
+#   opus --benchmark [<seconds>]
 # 
 # 	Examples:
 #   opus 'ネネ (CV:水瀬いのり).flac' 3:07 3:15
 #   opus 'music.flac' 3:07
+#   opus -j 0 'Some Album/'
+#   opus -e libopus 'Some Album/'
+#   opus -r -j 0 'Music Library/'
+#   opus -s -j 0 'Concert (3 hours).flac'
+#   opus --renditions 48,64,128 'Some Album/'
+#   opus -j 0 -c 0:30-0:45 -c 3:07-3:15 'Stream recording.mkv'
 
 # ################### CONFIGURATION OPTIONS ###################
 # #############################################################
@@ -56,6 +64,16 @@ BITRATE = 64
 #
 OPUS_VBR = True
 
+#
+# Encode every file into several renditions at once, a list of (bitrate, vbr) pairs, e.g [(48, True), (64, True), (128, False)].
+# Each file is still probed, decoded and has its cover prepared only once, the encoders of all renditions run in parallel on the same decoded audio.
+# The bitrate is appended to the output names, e.g Track_64k.opus, or Track_128k_cbr.opus without VBR.
+# None encodes just one file with BITRATE and OPUS_VBR. Can also be set with --renditions, e.g --renditions 48,64,128:cbr
+#
+# Default: None
+#
+RENDITIONS = None
+
 # Path to output folder, if set to None it will be saved into the same folder as the input file
 # Examples:
 # "/someLinux/path"
@@ -125,6 +143,131 @@ WITH_COVER = True
 #
 BATCH_EXTENSIONS = ('.mkv', '.mka', '.mp4', '.flac', '.m4a', '.mp3', '.aac', '.wav', '.oga', '.ogg', '.alac')
 
+#
+# If set to True, folders are encoded recursively, including all sub-folders.
+# Files are encoded as they're found and the folder structure is mirrored in OUTPUT_PATH.
+# Can also be set with --recursive.
+#
+# Default: False
+#
+RECURSIVE = False
+
+#
+# How many finished files are moved to OUTPUT_PATH at the same time, while the next ones are still encoding.
+# If the moves can't keep up (e.g slow network path), encoding waits once a few finished files are queued up.
+#
+# Default: 2
+#
+TRANSFER_JOBS = 2
+
+#
+# How often (in seconds) the progress (percent, speed and ETA) of running encodes is printed, 0 turns it off.
+#
+# Default: 5
+#
+PROGRESS_INTERVAL = 5
+
+#
+# File to write a JSON report with timings of every file (probe, cover, decode/encode, move) and their output bitrate to,
+# e.g to compare machines or settings. None writes no report. Can also be set with --report.
+#
+# Default: None
+#
+REPORT_PATH = None
+
+#
+# If set to True, encoding a single file (not a folder) with more than one job splits it into time segments
+# that get encoded in parallel and then joined (gaplessly, without re-encoding) into one opus file,
+# so e.g a 3 hour recording uses all CPU cores. Can also be set with --split.
+#
+# Default: False
+#
+SPLIT_LONG_FILES = False
+
+#
+# Shortest segment length in seconds when splitting, files shorter than two of these aren't split.
+#
+# Default: 60
+#
+SPLIT_MIN_SEGMENT_SECONDS = 60
+
+#
+# If set to True, split encodes are checked against a normal encode of the same file: same number of samples,
+# and no shift at the segment boundaries. Takes longer than not splitting at all, meant for testing. Can also be set with --verify-split.
+#
+# Default: False
+#
+SPLIT_VERIFY = False
+
+#
+# How to encode:
+#   'libopus'      - Decodes and encodes in a single ffmpeg process (ffmpeg's libopus encoder), the fastest option.
+#   'opusenc'      - Decodes with ffmpeg and pipes raw (32bit float WAV) audio into opusenc.
+#   'opusenc-flac' - Same as 'opusenc' but pipes FLAC, which costs an extra lossless encode and decode per file.
+# Can also be set with --engine.
+#
+# Default: 'opusenc'
+#
+ENCODE_ENGINE = 'opusenc'
+
+#
+# How many files to encode at the same time when batch-encoding a folder, each one runs its own ffmpeg/opusenc pair.
+# Can also be set with --jobs, 0 uses one job per CPU core.
+#
+# Default: 1
+#
+JOBS = 1
+
+#
+# SQLite file ffprobe results get cached in, so files that didn't change (same path, size and modification time)
+# aren't probed again on later runs, which is noticeable on network shares. Set to None to disable.
+#
+# Default: "~/.cache/opus_maker/probe.db"
+#
+PROBE_CACHE = "~/.cache/opus_maker/probe.db"
+
+#
+# Folder compressed cover art gets kept in, named by a hash of the original image, so each distinct cover
+# is only compressed once, even across runs. If set to None they're only kept for the current run.
+#
+# Default: None
+#
+COVER_CACHE = None
+
+#
+# Folder files are encoded in before they're moved to OUTPUT_PATH (or next to the input file), covers are compressed there too.
+# Every run uses its own private sub-folder, removed once done (also on errors and Ctrl+C). None uses the system's temp folder.
+# This should be fast local storage (e.g a tmpfs or SSD), not a network share, and have room for a few encoded files.
+#
+# Default: None
+#
+TEMP_PATH = None
+
+#
+# If set to True, a manifest (.opus_manifest.db) in the output folder remembers which source file was encoded into which
+# output file, and with which settings. Only used with an OUTPUT_PATH or a folder as input. Re-running on the same folder then only encodes files that are new or changed since,
+# and re-encoded files replace their previous output instead of getting a numbered duplicate. --force re-encodes everything.
+#
+# Default: True
+#
+USE_MANIFEST = True
+
+#
+# How often (in seconds) a watched folder (opus watch <folder>) is checked for new files. On Linux new files are noticed right away (inotify),
+# this is only a fallback there, e.g for network shares.
+#
+# Default: 10
+#
+WATCH_INTERVAL = 10
+
+#
+# A new file in a watched folder is only encoded once its size and modification time haven't changed for this many seconds,
+# so files that are still being copied in aren't picked up half way.
+#
+# Default: 5
+#
+WATCH_SETTLE_SECONDS = 5
+
 #
 # If set to True, the script will overwrite the target files. If set to False it will append increasing numbers to the filenames if existing.
 #
@@ -146,44 +289,1221 @@ APPEND_TIME = True
 # ################ you know what you're doing   ###############
 # #############################################################
 import argparse
+import array
+import atexit
+import base64
+import concurrent.futures
+import ctypes
+import hashlib
 import json
+import math
 import os
 import pathlib
+import platform
+import queue
 import re
+import select
 import subprocess
 import sys
 import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Callable, Iterable, Iterator, List
+
+class EncodeError(Exception):
+	pass
+
+class EncodeJob():
+	Input: Path
+	Number: int
+	Total: int
+	Clip: EncodeClip
+	Outputs: List[Path]
+	PartialOutputs: List[Path]
+	TempFiles: List[Path]
+	Error: str
+	Version: tuple
+	Covers: List[str]
+	Took: float
+	Duration: float
+	Position: float
+	Speed: float
+	LastProgress: float
+	Timings: dict
+	Stages: List[dict]
+
+	def __init__(self, input_path: Path, number: int, total: int, clip: EncodeClip = None, version: tuple = None):
+		self.Input = input_path
+		self.Number = number
+		self.Total = total
+		self.Clip = clip
+		self.Version = version # (size, mtime) of the file when it was queued, watch mode only
+		self.Covers = [] # Digests of the cover images used, see compressCover()
+		self.Outputs = []
+		self.PartialOutputs = []
+		self.TempFiles = []
+		self.Error = None
+		self.Took = 0.0
+		self.Duration = None
+		self.Position = 0.0
+		self.Speed = None
+		self.LastProgress = 0.0
+		self.Timings = {}
+		self.Stages = []
+
+	@property
+	def Label(self) -> str:
+		if self.Total is None: # Still discovering files, e.g recursive mode.
+			return F'[{self.Number}]'
+		return F'[{self.Number:>{len(str(self.Total))}}/{self.Total}]'
+
+	@property
+	def Batch(self) -> bool:
+		return self.Total is None or self.Total > 1
+
+	@property
+	def Output(self) -> Path:
+		'''The (first, if encoding several renditions) output file, None until it's encoded.'''
+		return self.Outputs[0] if self.Outputs else None
+
+	@property
+	def Fraction(self) -> float:
+		'''How much of the file is encoded, 0.0 to 1.0.'''
+		if self.Output:
+			return 1.0
+		if not self.Duration:
+			return 0.0
+		return min(self.Position / self.Duration, 1.0)
+
+	def toReport(self) -> dict:
+		outputs = []
+		for output in self.Outputs if not self.Error else []:
+			try:
+				output_bytes = os.stat(output).st_size
+			except OSError:
+				output_bytes = None
+			outputs.append({
+				'path': str(output),
+				'bytes': output_bytes,
+				'kbps': round(output_bytes * 8 / self.Duration / 1000, 1) if output_bytes and self.Duration else None,
+			})
+		return {
+			'input': str(self.Input),
+			'start': self.Clip.Start if self.Clip else None,
+			'end': self.Clip.End if self.Clip else None,
+			'output': str(self.Output) if self.Output else None,
+			'error': self.Error.splitlines()[0] if self.Error else None,
+			'audio_seconds': self.Duration,
+			'seconds': round(self.Took, 3),
+			'output_bytes': outputs[0]['bytes'] if outputs else None,
+			'output_kbps': outputs[0]['kbps'] if outputs else None,
+			'outputs': outputs, # Every rendition, see RENDITIONS
+			'timings': {k: round(v, 3) for k, v in self.Timings.items()},
+			'stages': self.Stages,
+		}
+
+	def __repr__(self):
+		return F'[EncodeJob] {self.Label} {self.Input}'
+
+def naturalSortKey(text: str) -> list:
+	return [int(c) if c.isdigit() else c for c in re.split('([0-9]+)', text)]
+
+def walkFiles(folder: Path, extensions: tuple, exclude: Path = None) -> Iterator[Path]:
+	'''
+		Lazily walks the folder tree, depth first, yielding files with one of the extensions.
+		Only one folder is listed at a time, so the first files come right away even for huge libraries.
+	'''
+	stack = [folder]
+	while stack:
+		current = stack.pop()
+		try:
+			with os.scandir(current) as it:
+				entries = list(it)
+		except OSError as e:
+			print(F"Can't list folder {current}: {e}")
+			continue
+		files = []
+		folders = []
+		for entry in entries:
+			try:
+				if entry.is_dir(follow_symlinks=False):
+					folders.append(entry.name)
+				elif entry.is_file() and entry.name.lower().endswith(extensions):
+					files.append(entry.name)
+			except OSError:
+				continue
+		for name in sorted(files, key=naturalSortKey):
+			yield current.joinpath(name)
+		for name in sorted(folders, key=naturalSortKey, reverse=True):
+			sub_folder = current.joinpath(name)
+			if exclude and sub_folder.resolve() == exclude:
+				continue # Don't encode our own outputs
+			stack.append(sub_folder)
+
+def formatSeconds(seconds: float) -> str:
+	seconds = int(seconds)
+	if seconds >= 3600:
+		return F"{seconds // 3600}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
+	return F"{seconds // 60}:{seconds % 60:02}"
+
+def parseRenditions(value: str, vbr: bool) -> list:
+	'''Parses --renditions, e.g 48,64,128:cbr into [(48, True), (64, True), (128, False)], vbr is the default.'''
+	renditions = []
+	for part in value.split(","):
+		bitrate, _, mode = part.strip().lower().partition(":")
+		if mode not in ('', 'vbr', 'cbr'):
+			raise argparse.ArgumentTypeError(F"'{part}' has to be a bitrate with optional :vbr or :cbr, e.g 128:cbr")
+		try:
+			renditions.append((int(bitrate.rstrip("k")), vbr if not mode else mode == 'vbr'))
+		except ValueError:
+			raise argparse.ArgumentTypeError(F"'{part}' has to be a bitrate with optional :vbr or :cbr, e.g 128:cbr")
+	return renditions
+
+def parseClip(value: str) -> tuple:
+	'''Parses a clip like 3:07-3:15 or "3:07 3:15" into (start, end), either side can be left out for the start/end of the file.'''
+	parts = re.split(r'\s*-\s*|\s+', value.strip(), maxsplit=1)
+	start = parts[0] or None
+	end = parts[1] if len(parts) > 1 and parts[1] else None
+	try:
+		for time_value in (start, end):
+			if time_value:
+				timeToSeconds(time_value)
+	except ValueError:
+		raise argparse.ArgumentTypeError(F"'{value}' has to be a clip like 3:07-3:15, 3:07- or 0-3:15")
+	return (start, end)
+
+def readClipList(path: str) -> list:
+	'''Clips from a text file, one per line (like --clip), blank lines and everything after # are ignored.'''
+	clips = []
+	try:
+		with open(path, encoding='utf-8') as f:
+			for line in f:
+				line = line.split('#', 1)[0].strip()
+				if line:
+					clips.append(parseClip(line))
+	except OSError as e:
+		raise argparse.ArgumentTypeError(F"can't read the clip list: {e}")
+	return clips
+
+def timeToSeconds(value: str) -> float:
+	'''Converts ffmpeg style time stamps, e.g 3:07, 1:02:03.5 or 187, to seconds.'''
+	seconds = 0.0
+	for part in value.split(":"):
+		seconds = seconds * 60 + float(part)
+	return seconds
+
+class ProbeCache():
+	'''
+		ffprobe results, keyed by path, size and modification time. One connection is shared by all jobs (behind a lock),
+		parallel runs share the file through SQLite's own locking.
+	'''
+	def __init__(self, db_path: Path):
+		db_path.parent.mkdir(parents=True, exist_ok=True)
+		self.lock = threading.Lock()
+		self.db = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.execute("CREATE TABLE IF NOT EXISTS probes (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, probe TEXT)")
+		self.db.commit()
+
+	def key(self, file_path: Path) -> tuple:
+		st = os.stat(file_path)
+		return (str(file_path.resolve()), st.st_size, st.st_mtime_ns)
+
+	def get(self, file_path: Path) -> dict:
+		path, size, mtime = self.key(file_path)
+		with self.lock:
+			row = self.db.execute("SELECT probe FROM probes WHERE path = ? AND size = ? AND mtime = ?", (path, size, mtime)).fetchone()
+		return json.loads(row[0]) if row else None
+
+	def put(self, file_path: Path, probe: dict) -> None:
+		path, size, mtime = self.key(file_path)
+		with self.lock:
+			self.db.execute("INSERT OR REPLACE INTO probes (path, size, mtime, probe) VALUES (?, ?, ?, ?)", (path, size, mtime, json.dumps(probe)))
+			self.db.commit()
+
+	def close(self) -> None:
+		with self.lock:
+			self.db.close()
+
+class EncodeManifest():
+	'''
+		Which source (and range of it) got encoded into which output, with which settings. A source counts as up to date
+		while its size, modification time and the settings match and the output still exists.
+	'''
+	FILE_NAME = ".opus_manifest.db"
+
+	def __init__(self, folder: Path):
+		self.lock = threading.Lock()
+		self.db = sqlite3.connect(str(folder.joinpath(self.FILE_NAME)), timeout=30, check_same_thread=False)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.execute("CREATE TABLE IF NOT EXISTS outputs (source TEXT, range TEXT, size INTEGER, mtime INTEGER, settings TEXT, output TEXT, encoded REAL, PRIMARY KEY (source, range))")
+		self.db.commit()
+
+	def get(self, source: Path, erange: str) -> dict:
+		with self.lock:
+			row = self.db.execute("SELECT size, mtime, settings, output FROM outputs WHERE source = ? AND range = ?", (str(source.resolve()), erange)).fetchone()
+		if not row:
+			return None
+		return {'size': row[0], 'mtime': row[1], 'settings': row[2], 'output': Path(row[3])}
+
+	def isUpToDate(self, source: Path, erange: str, settings: str) -> bool:
+		entry = self.get(source, erange)
+		if not entry or entry['settings'] != settings or not entry['output'].exists():
+			return False
+		st = os.stat(source)
+		return entry['size'] == st.st_size and entry['mtime'] == st.st_mtime_ns
+
+	def record(self, source: Path, erange: str, settings: str, output: Path) -> None:
+		st = os.stat(source)
+		with self.lock:
+			self.db.execute("INSERT OR REPLACE INTO outputs (source, range, size, mtime, settings, output, encoded) VALUES (?, ?, ?, ?, ?, ?, ?)",
+				(str(source.resolve()), erange, st.st_size, st.st_mtime_ns, settings, str(output.resolve()), time.time()))
+			self.db.commit()
+
+	def close(self) -> None:
+		with self.lock:
+			self.db.close()
+
+class WatchQueue():
+	'''
+		Files found in a watched folder and what became of them, by path, size and modification time.
+		A restarted watch re-queues files that were queued or encoding when it stopped, done and failed ones only once they change.
+	'''
+	FILE_NAME = ".opus_watch.db"
+
+	def __init__(self, folder: Path):
+		self.lock = threading.Lock()
+		self.db = sqlite3.connect(str(folder.joinpath(self.FILE_NAME)), timeout=30, check_same_thread=False)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, state TEXT, error TEXT, updated REAL)")
+		self.db.commit()
+
+	def getState(self, path: Path, st: os.stat_result) -> str:
+		'''queued, done or failed, None if the file is new or changed since.'''
+		with self.lock:
+			row = self.db.execute("SELECT state FROM files WHERE path = ? AND size = ? AND mtime = ?", (str(path), st.st_size, st.st_mtime_ns)).fetchone()
+		return row[0] if row else None
+
+	def queue(self, path: Path, st: os.stat_result) -> None:
+		with self.lock:
+			self.db.execute("INSERT OR REPLACE INTO files (path, size, mtime, state, error, updated) VALUES (?, ?, ?, 'queued', NULL, ?)",
+				(str(path), st.st_size, st.st_mtime_ns, time.time()))
+			self.db.commit()
+
+	def finish(self, path: Path, version: tuple, error: str = None) -> None:
+		'''Marks the (size, mtime) version of the file as done or failed, a newer version that got queued meanwhile stays queued.'''
+		with self.lock:
+			self.db.execute("UPDATE files SET state = ?, error = ?, updated = ? WHERE path = ? AND size = ? AND mtime = ?",
+				('failed' if error else 'done', error, time.time(), str(path), version[0], version[1]))
+			self.db.commit()
+
+	def countQueued(self) -> int:
+		with self.lock:
+			return self.db.execute("SELECT COUNT(*) FROM files WHERE state = 'queued'").fetchone()[0]
+
+	def close(self) -> None:
+		with self.lock:
+			self.db.close()
+
+class FolderWatcher():
+	'''
+		Waits until something changes in the watched folders or the timeout runs out. Uses inotify on Linux,
+		so new files are noticed right away, elsewhere (or on file systems without it) it just waits for the timeout.
+	'''
+	IN_CLOSE_WRITE = 0x00000008
+	IN_MOVED_TO = 0x00000080
+	IN_CREATE = 0x00000100
+
+	def __init__(self):
+		self.fd = None
+		self.folders = set()
+		if sys.platform.startswith('linux'):
+			try:
+				self.libc = ctypes.CDLL(None, use_errno=True)
+				fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+				if fd >= 0:
+					self.fd = fd
+			except (OSError, AttributeError):
+				pass
+
+	def add(self, folder: Path) -> None:
+		if self.fd is None or str(folder) in self.folders:
+			return
+		self.folders.add(str(folder))
+		self.libc.inotify_add_watch(self.fd, os.fsencode(str(folder)), self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE)
+
+	def wait(self, timeout: float) -> None:
+		if self.fd is None:
+			time.sleep(timeout)
+			return
+		ready, _, _ = select.select([self.fd], [], [], timeout)
+		if ready:
+			try:
+				while os.read(self.fd, 65536):
+					pass # Only whether something happened matters, the folder gets rescanned anyways.
+			except BlockingIOError:
+				pass
+
+	def close(self) -> None:
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+
+def ffmetadataEscape(value: str) -> str:
+	for c in ('\\', '=', ';', '#', '\n'):
+		value = value.replace(c, '\\' + c)
+	return value
+
+def pictureBlock(image_data: bytes, width: int, height: int, mime_type: str = 'image/jpeg') -> str:
+	'''
+		Base64 encoded FLAC picture block (front cover), which is how Ogg Opus files carry cover art,
+		as the METADATA_BLOCK_PICTURE comment.
+	'''
+	mime = mime_type.encode('ascii')
+	block = struct.pack('>II', 3, len(mime)) + mime + struct.pack('>IIIIII', 0, width, height, 24, 0, len(image_data)) + image_data
+	return base64.b64encode(block).decode('ascii')
+
+# Ogg's CRC32 is the same polynomial as zlib's, just not bit reflected and without the inverted start and end value,
+# so zlib does it (a lot faster than Python could) on bit reversed bytes.
+BIT_REVERSE = bytes(int(F'{i:08b}'[::-1], 2) for i in range(256))
+
+def oggCrc(data: bytes) -> int:
+	crc = ~zlib.crc32(data.translate(BIT_REVERSE), 0xFFFFFFFF) & 0xFFFFFFFF
+	return int(F'{crc:032b}'[::-1], 2)
+
+class OggStream():
+	'''
+		The pages of an Ogg Opus file, split up into the raw header pages (OpusHead and OpusTags) and the audio packets,
+		all that's needed to cut and stitch Opus streams without re-encoding.
+	'''
+	HeaderPages: List[bytes]
+	Head: bytes
+	Packets: List[bytes]
+	Serial: int
+	LastSequence: int
+	LastGranule: int
+
+	def __init__(self, path: Path):
+		self.HeaderPages = []
+		self.Packets = []
+		self.Head = None
+		self.Serial = None
+		self.LastSequence = 0
+		self.LastGranule = 0
+		packets = 0 # Completed packets, the first two are OpusHead and OpusTags.
+		partial = b''
+		with open(path, 'rb') as f:
+			data = f.read()
+		pos = 0
+		while pos < len(data):
+			if data[pos:pos + 4] != b'OggS':
+				raise EncodeError(F"Broken Ogg page in {path} at byte {pos}")
+			_, _, granule, serial, sequence, _, segment_count = struct.unpack_from('<BBqIIIB', data, pos + 4)
+			lacing = data[pos + 27:pos + 27 + segment_count]
+			body = pos + 27 + segment_count
+			end = body + sum(lacing)
+			if self.Serial is None:
+				self.Serial = serial
+			header_page = packets < 2
+			for size in lacing:
+				partial += data[body:body + size]
+				body += size
+				if size < 255:
+					if packets == 0:
+						self.Head = partial
+					elif packets >= 2:
+						self.Packets.append(partial)
+					packets += 1
+					partial = b''
+			if header_page:
+				self.HeaderPages.append(data[pos:end])
+			self.LastSequence = sequence
+			if granule != -1:
+				self.LastGranule = granule
+			pos = end
+		if not self.Head or not self.Head.startswith(b'OpusHead'):
+			raise EncodeError(F"{path} is no Ogg Opus file.")
+
+	@property
+	def PreSkip(self) -> int:
+		return struct.unpack_from('<H', self.Head, 10)[0]
+
+def opusPacketSamples(packet: bytes) -> int:
+	'''Number of (48kHz) samples an Opus packet decodes to, from its TOC byte (RFC 6716 3.1).'''
+	config = packet[0] >> 3
+	if config < 12: # SILK
+		frame = (480, 960, 1920, 2880)[config & 3]
+	elif config < 16: # Hybrid
+		frame = (480, 960)[config & 1]
+	else: # CELT
+		frame = (120, 240, 480, 960)[config & 3]
+	code = packet[0] & 3
+	if code == 0:
+		frames = 1
+	elif code < 3:
+		frames = 2
+	else:
+		frames = packet[1] & 0x3F
+	return frame * frames
+
+def oggPage(serial: int, sequence: int, granule: int, packets: List[bytes], flags: int = 0) -> bytes:
+	lacing = b''
+	for packet in packets:
+		lacing += b'\xff' * (len(packet) // 255) + bytes((len(packet) % 255, ))
+	page = bytearray(b'OggS' + struct.pack('<BBqIIIB', 0, flags, granule, serial, sequence, 0, len(lacing)) + lacing + b''.join(packets))
+	struct.pack_into('<I', page, 22, oggCrc(page))
+	return bytes(page)
+
+class EncodeProfile():
+	'''Bitrate and VBR of one rendition, see RENDITIONS.'''
+	Bitrate: int
+	Vbr: bool
+
+	def __init__(self, bitrate: int, vbr: bool):
+		self.Bitrate = bitrate
+		self.Vbr = vbr
+
+	@property
+	def Suffix(self) -> str:
+		'''Appended to the output file name when encoding several renditions, e.g _64k or _128k_cbr.'''
+		return F"_{self.Bitrate:g}k" + ("" if self.Vbr else "_cbr")
+
+	def __repr__(self):
+		return F'[EncodeProfile] {self.Bitrate}kbps {"VBR" if self.Vbr else "CBR"}'
+
+class EncodeClip():
+	'''The range of a source to encode, Start and End are ffmpeg style time stamps (e.g 3:07), None for the start/end of the file.'''
+	Start: str
+	End: str
+
+	def __init__(self, start: str = None, end: str = None):
+		self.Start = start
+		self.End = end
+
+	@property
+	def StartSeconds(self) -> float:
+		return timeToSeconds(self.Start) if self.Start else 0.0
+
+	@property
+	def EndSeconds(self) -> float:
+		return timeToSeconds(self.End) if self.End else None
+
+	@property
+	def Range(self) -> str:
+		'''Tells outputs of the same source apart in the manifest.'''
+		return F"{self.Start or ''}-{self.End or ''}"
+
+	@property
+	def Description(self) -> str:
+		if self.Start and self.End:
+			return F" from {self.Start} to {self.End}"
+		elif self.Start:
+			return F" from {self.Start} to end"
+		elif self.End:
+			return F" from start to {self.End}"
+		return ""
+
+	@property
+	def NameSuffix(self) -> str:
+		'''Appended to the output file name with APPEND_TIME, e.g _3-07_3-15.'''
+		if not self.Start and not self.End:
+			return ""
+		return F"_{(self.Start or '0-00').replace(':', '-')}" + (F"_{self.End.replace(':', '-')}" if self.End else "")
+
+	def __repr__(self):
+		return F'[EncodeClip] {self.Range}'
+
+class EncodeSegment():
+	'''
+		One time segment of a split encode. All positions are in 48kHz samples.
+		Start is where the segment begins in the output,
+		Seek is where ffmpeg seeks to in the source (whole seconds, where the 48kHz grid lines up with any other sample rate),
+		StartSample/EndSample cut the segment (including its pre-roll and tail) from there,
+		KeepStart/KeepEnd select the packets of the segment's own Opus stream (pre-skip included) that end up in the stitched file.
+	'''
+	Index: int
+	Start: int
+	Seek: int
+	StartSample: int
+	EndSample: int
+	KeepStart: int
+	KeepEnd: int
+	Output: Path
+	Position: float
+
+	def __init__(self, index: int, start: int, seek: int, start_sample: int, end_sample: int, keep_start: int, keep_end: int, output: Path):
+		self.Index = index
+		self.Start = start
+		self.Seek = seek
+		self.StartSample = start_sample
+		self.EndSample = end_sample
+		self.KeepStart = keep_start
+		self.KeepEnd = keep_end
+		self.Output = output
+		self.Position = 0.0
+
+	def __repr__(self):
+		return F'[EncodeSegment] {self.Index}: {self.Seek}s +{self.StartSample}-{self.EndSample}, keep {self.KeepStart}-{self.KeepEnd}'
+
+class PipelineStage():
+	Name: str
+	Command: List[str]
+	InputData: bytes
+	Process: subprocess.Popen
+	ReturnCode: int
+	ErrorOutput: List[str]
+	Started: float
+	Ended: float
+	CpuTime: float
+	PeakRss: int
+	Progress: bool
+	Upstream: PipelineStage
+
+	def __init__(self, name: str, command: List[str], input_data: bytes = None, progress: bool = False, upstream: PipelineStage = None):
+		self.Name = name
+		self.Command = command
+		self.InputData = input_data
+		self.Progress = progress
+		self.Upstream = upstream
+		self.Process = None
+		self.ReturnCode = None
+		self.ErrorOutput = []
+		self.Started = None
+		self.Ended = None
+		self.CpuTime = None
+		self.PeakRss = None
+
+	@property
+	def Elapsed(self) -> float:
+		return (self.Ended or time.time()) - self.Started
+
+	def toReport(self) -> dict:
+		return {
+			'name': self.Name,
+			'seconds': round(self.Elapsed, 3),
+			'cpu_seconds': round(self.CpuTime, 3) if self.CpuTime is not None else None,
+			'peak_rss_bytes': self.PeakRss,
+		}
+
+	def __repr__(self):
+		return F'[PipelineStage] {self.Name}: {subprocess.list2cmdline(self.Command)}'
+
+class EncodePipeline():
+	'''
+		Runs a chain of processes, each one piping its stdout into the next one (e.g ffmpeg | opusenc).
+		Stages with an Upstream read from that stage instead of the previous one, if several read from the same stage
+		its output is copied to all of them (e.g one ffmpeg decode into an opusenc per rendition).
+		The stderr of every stage is drained in its own thread, so a chatty stage can't fill the pipe and stall,
+		the exit codes of all stages are checked, and if one fails the others are killed
+		and an EncodeError with the error output of the failed stage is raised.
+		ffmpeg stages marked with Progress write their -progress key=value blocks to stderr as well,
+		those get picked out and passed to on_progress(seconds done, speed).
+	'''
+	MAX_ERROR_LINES = 20
+	TEE_CHUNK_SIZE = 1 << 20
+	TEE_QUEUE_CHUNKS = 4
+	PROGRESS_KEYS = ('frame', 'fps', 'bitrate', 'total_size', 'out_time_us', 'out_time_ms', 'out_time', 'dup_frames', 'drop_frames', 'speed', 'progress')
+
+	def __init__(self, maker: OpusMaker, stages: List[PipelineStage], duration: float = None, on_progress: Callable[[float, float], None] = None):
+		self.maker = maker
+		self.stages = stages
+		self.duration = duration
+		self.onProgress = on_progress
+		self.failed = threading.Event()
+
+	def parseProgress(self, values: dict) -> None:
+		try:
+			position = int(values.get('out_time_us', values.get('out_time_ms', '0'))) / 1000000
+		except ValueError:
+			position = 0.0 # N/A before the first packet
+		try:
+			speed = float(values.get('speed', '').rstrip('x'))
+		except ValueError:
+			speed = None
+		if self.onProgress:
+			self.onProgress(position, speed)
+
+	def drain(self, stage: PipelineStage) -> None:
+		values = {}
+		for line in iter(stage.Process.stderr.readline, b''):
+			line = line.decode('utf-8', 'replace').rstrip()
+			if stage.Progress:
+				key, sep, value = line.partition('=')
+				if sep and key.startswith(self.PROGRESS_KEYS):
+					values[key] = value.strip()
+					if key == 'progress':
+						self.parseProgress(values)
+						values = {}
+					continue
+			stage.ErrorOutput.append(line)
+			del stage.ErrorOutput[:-self.MAX_ERROR_LINES]
+		stage.Process.stderr.close()
+		usage = None
+		if hasattr(os, 'wait4'):
+			# Same as Popen.wait(), but also tells us how much CPU time the stage used.
+			try:
+				_, status, usage = os.wait4(stage.Process.pid, 0)
+			except ChildProcessError:
+				pass # Already reaped by Popen itself, kill() polls before it sends the signal.
+		if usage:
+			stage.Process.returncode = os.waitstatus_to_exitcode(status)
+			stage.CpuTime = usage.ru_utime + usage.ru_stime
+			stage.PeakRss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024 # macOS reports bytes, others KiB
+		else:
+			stage.Process.wait()
+		stage.Ended = time.time()
+		stage.ReturnCode = stage.Process.returncode
+		self.maker.endProcess(stage.Process)
+		if stage.ReturnCode != 0:
+			self.failed.set()
+
+	def feed(self, stage: PipelineStage) -> None:
+		try:
+			stage.Process.stdin.write(stage.InputData)
+			stage.Process.stdin.close()
+		except OSError:
+			pass # The stage died, drain() reports it.
+
+	def tee(self, stage: PipelineStage, consumers: List[PipelineStage]) -> None:
+		'''
+			Copies the output of the stage to all consumers. Each one gets its own writer thread and a few chunks of buffer,
+			so they all encode at the same time and only the slowest one holds the others back.
+		'''
+		chunks = [queue.Queue(maxsize=self.TEE_QUEUE_CHUNKS) for _ in consumers]
+		writers = [threading.Thread(target=self.teeWrite, args=(consumer, q), daemon=True) for consumer, q in zip(consumers, chunks)]
+		for writer in writers:
+			writer.start()
+		try:
+			while True:
+				try:
+					chunk = stage.Process.stdout.read1(self.TEE_CHUNK_SIZE)
+				except (OSError, ValueError):
+					chunk = b'' # Killed, drain() reports it.
+				for q in chunks:
+					q.put(chunk)
+				if not chunk:
+					break
+		finally:
+			stage.Process.stdout.close()
+			for writer in writers:
+				writer.join()
+
+	def teeWrite(self, stage: PipelineStage, chunks: queue.Queue) -> None:
+		alive = True
+		while True:
+			chunk = chunks.get()
+			if not chunk:
+				break
+			if alive:
+				try:
+					stage.Process.stdin.write(chunk)
+				except (OSError, ValueError):
+					alive = False # The stage died, drain() reports it, keep taking chunks so the others aren't held up.
+		try:
+			stage.Process.stdin.close()
+		except OSError:
+			pass
+
+	def run(self) -> List[PipelineStage]:
+		threads = []
+		previous = None
+		consumers = {}
+		for stage in self.stages:
+			if previous:
+				stage.Upstream = stage.Upstream or previous
+				consumers.setdefault(id(stage.Upstream), []).append(stage)
+			previous = stage
+		try:
+			for stage in self.stages:
+				upstream = stage.Upstream
+				if upstream and len(consumers[id(upstream)]) == 1:
+					stdin = upstream.Process.stdout
+				elif upstream:
+					stdin = subprocess.PIPE # Fed by tee()
+				else:
+					stdin = subprocess.PIPE if stage.InputData is not None else subprocess.DEVNULL
+				stage.Started = time.time()
+				stage.Process = self.maker.startProcess(stage.Command,
+					stdin=stdin,
+					stdout=subprocess.PIPE if id(stage) in consumers else subprocess.DEVNULL,
+					stderr=subprocess.PIPE,
+				)
+				if stage.InputData is not None and not upstream:
+					threading.Thread(target=self.feed, args=(stage, ), daemon=True).start()
+				if upstream and len(consumers[id(upstream)]) == 1:
+					# Only the next stage may hold the read end, otherwise the previous one never sees it close.
+					upstream.Process.stdout.close()
+				thread = threading.Thread(target=self.drain, args=(stage, ), daemon=True)
+				thread.start()
+				threads.append(thread)
+			for stage in self.stages:
+				if len(consumers.get(id(stage), [])) > 1:
+					thread = threading.Thread(target=self.tee, args=(stage, consumers[id(stage)]), daemon=True)
+					thread.start()
+					threads.append(thread)
+		except (OSError, EncodeError):
+			self.kill()
+			raise
+
+		while any(t.is_alive() for t in threads):
+			if self.failed.wait(0.25):
+				self.kill()
+				break
+		for thread in threads:
+			thread.join()
+
+		failed = [x for x in self.stages if x.ReturnCode != 0]
+		if len(failed):
+			# The stage that died first is the cause, the others most likely just lost their pipe.
+			stage = min(failed, key=lambda x: x.Ended)
+			raise EncodeError(
+				F"{stage.Name} failed with exit code {stage.ReturnCode}, command was: {subprocess.list2cmdline(stage.Command)}"
+				+ ("".join("\n\t" + x for x in stage.ErrorOutput) if len(stage.ErrorOutput) else "")
+			)
+		return self.stages
+
+	def kill(self) -> None:
+		for stage in self.stages:
+			if stage.Process and stage.Process.returncode is None:
+				try:
+					stage.Process.kill()
+				except OSError:
+					pass
+
+	def summary(self) -> str:
+		parts = []
+		for stage in self.stages:
+			part = F"{stage.Name}: {stage.Elapsed:.1f}s"
+			if stage.CpuTime is not None:
+				part += F" ({stage.CpuTime:.1f}s CPU)"
+			if self.duration and stage.Elapsed > 0:
+				part += F", {self.duration / stage.Elapsed:.1f}x realtime"
+			parts.append(part)
+		return " | ".join(parts)
 
 class OpusMaker:
-	def compressCover(self, file_path: Path) -> Path:
-		print(F"Compressing cover {file_path}...")
-		temp_out_path = file_path.change_name(F"{abs(hash(file_path.stem))}_opusthing_xyz.jpg")
+	ENGINES = ('libopus', 'opusenc', 'opusenc-flac')
+	COVER_SIZE = 300
+	# Split encoding, in 48kHz samples: packet size (20ms, both encoders' default), pre-skip (libopus' look-ahead),
+	# pre-roll before each segment (~1s, chosen so pre-skip + pre-roll is a whole number of packets) and look-ahead after.
+	SPLIT_SAMPLE_RATE = 48000
+	SPLIT_FRAME_SIZE = 960
+	SPLIT_PRE_SKIP = 312
+	SPLIT_PREROLL = 960 * 50 - 312
+	SPLIT_TAIL = 960 * 2
+	# Types of common extensions, so libmagic only has to look inside files with other extensions.
+	MEDIA_TYPES = {
+		'.flac': 'audio/flac', '.alac': 'audio/mp4', '.wav': 'audio/x-wav', '.mp3': 'audio/mpeg', '.aac': 'audio/aac',
+		'.m4a': 'audio/mp4', '.mka': 'audio/x-matroska', '.oga': 'audio/ogg', '.ogg': 'audio/ogg', '.opus': 'audio/ogg',
+		'.wma': 'audio/x-ms-wma', '.aiff': 'audio/x-aiff', '.ape': 'audio/x-ape', '.wv': 'audio/x-wavpack',
+		'.mkv': 'video/x-matroska', '.mp4': 'video/mp4', '.webm': 'video/webm', '.mov': 'video/quicktime', '.avi': 'video/x-msvideo',
+		'.ttf': 'font/ttf', '.otf': 'font/otf',
+	}
+
+	def log(self, message: str, job: EncodeJob = None) -> None:
+		# Lines of parallel jobs get prefixed with the job number, so they stay readable while interleaved.
+		if self.quiet:
+			return
+		if job is None:
+			job = getattr(self.localState, 'job', None)
+		with self.printLock:
+			if job and job.Batch:
+				print(F'{job.Label} {message}')
+			else:
+				print(message)
+
+	def addTiming(self, name: str, seconds: float) -> None:
+		job = getattr(self.localState, 'job', None)
+		if job:
+			job.Timings[name] = job.Timings.get(name, 0.0) + seconds
+
+	def reportProgress(self, job: EncodeJob, position: float, speed: float) -> None:
+		if job is None:
+			return
+		job.Position = position
+		job.Speed = speed
+		now = time.time()
+		if not self.progressInterval or now - job.LastProgress < self.progressInterval:
+			return
+		job.LastProgress = now
+		line = F"{job.Fraction * 100:5.1f}%"
+		if speed:
+			line += F", {speed:.1f}x realtime"
+			if job.Duration:
+				line += F", ETA {formatSeconds(max(job.Duration - position, 0) / speed)}"
+		if job.Total and job.Total > 1:
+			with self.progressLock:
+				done = sum(x.Fraction for x in self.startedJobs)
+			fraction = done / job.Total
+			if fraction > 0:
+				elapsed = now - self.batchStarted
+				line += F" | Batch: {fraction * 100:.1f}%, ETA {formatSeconds(elapsed / fraction - elapsed)}"
+		self.log(line, job)
+
+	def writeReport(self, jobs: List[EncodeJob], started: float, path: Path) -> None:
+		wall = time.time() - started
+		audio_seconds = sum(job.Duration or 0 for job in jobs if job.Output and not job.Error)
+		report = {
+			'host': platform.node(),
+			'platform': platform.platform(),
+			'cpus': os.cpu_count(),
+			'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+			'settings': {
+				'engine': self.engine,
+				'bitrate': self.bitrate,
+				'vbr': self.opusVbr,
+				'renditions': [{'bitrate': profile.Bitrate, 'vbr': profile.Vbr} for profile in self.profiles] if self.renditions else None,
+				'cover': self.withCover,
+				'jobs': self.jobs,
+				'transfer_jobs': self.transferJobs,
+				'start': self.startTime,
+				'end': self.endTime,
+				'clips': [{'start': clip.Start, 'end': clip.End} for clip in self.clips] if self.clips else None,
+			},
+			'wall_seconds': round(wall, 3),
+			'files': len(jobs),
+			'failed': len([job for job in jobs if job.Error]),
+			'audio_seconds': round(audio_seconds, 3),
+			'realtime_factor': round(audio_seconds / wall, 2) if wall > 0 else None,
+			'jobs': [job.toReport() for job in jobs],
+		}
+		try:
+			with open(path, 'w', encoding='utf-8') as f:
+				json.dump(report, f, indent=4, ensure_ascii=False)
+			print(F"Wrote report to: {path}")
+		except OSError as e:
+			print(F"Writing the report to {path} failed: {e}")
+
+	def trackTempFile(self, path: Path) -> None:
+		job = getattr(self.localState, 'job', None)
+		if job:
+			job.TempFiles.append(path)
+
+	def startProcess(self, cmd: List[str], **kwargs) -> subprocess.Popen:
+		with self.processLock:
+			if self.cancelled.is_set():
+				raise EncodeError("Cancelled")
+			p = subprocess.Popen(cmd, **kwargs)
+			self.processes.add(p)
+		return p
+
+	def endProcess(self, p: subprocess.Popen) -> None:
+		with self.processLock:
+			self.processes.discard(p)
+
+	def killProcesses(self) -> None:
+		with self.processLock:
+			for p in self.processes:
+				try:
+					p.kill()
+				except OSError:
+					pass
+			self.processes.clear()
+
+	def runJob(self, job: EncodeJob) -> None:
+		self.localState.job = job
+		start_time = time.time()
+		try:
+			if self.cancelled.is_set():
+				return
+			job.Outputs = self.encodeFile(job.Input)
+			job.Took = time.time() - start_time
+			if job.Batch and not self.cancelled.is_set():
+				self.log(F"Done, took {job.Took:.1f}s")
+			if self.transferQueue:
+				self.transferQueue.put(job) # Blocks while too many files wait for their transfer.
+		except Exception as e:
+			# Not just EncodeErrors, e.g an encoder that can't be started (OSError), in a worker thread nothing else would report it.
+			job.Error = str(e) if isinstance(e, EncodeError) else F"{type(e).__name__}: {e}"
+			self.log(F"Failed: {job.Error}")
+			self.releaseLocalOutputs(job)
+			if self.watchQueue:
+				self.watchQueue.finish(job.Input, job.Version, job.Error)
+				self.forgetJob(job)
+		finally:
+			self.localState.job = None
+
+	def forgetJob(self, job: EncodeJob) -> None:
+		'''
+			Watching doesn't end, so finished jobs aren't kept around for the summary (and progress) of the batch,
+			neither are the probes and covers of their file. Results still being worked on stay, other jobs are waiting for them.
+		'''
+		with self.progressLock:
+			self.startedJobs.remove(job)
+		path = str(job.Input)
+		with self.probeLock:
+			for key in [key for key, pending in self.probes.items() if key[0] == path and pending.done()]:
+				del self.probes[key]
+		with self.coverLock:
+			for key in [key for key, pending in self.fileCovers.items() if key[0] == path and pending.done()]:
+				del self.fileCovers[key]
+			for digest in job.Covers:
+				pending = self.covers.get(digest)
+				if pending is not None and pending.done():
+					del self.covers[digest] # The compressed file stays in the cover folder, so a later track with the same cover only reads it again.
+
+	def watchFiles(self, folder: Path) -> Iterator[Path]:
+		'''
+			Yields every file (and its stat) of the watched folder once it's complete, i.e its size and modification time didn't change
+			for WATCH_SETTLE_SECONDS, and it wasn't encoded before. Then keeps watching for new ones, until interrupted.
+		'''
+		watcher = FolderWatcher()
+		watcher.add(folder)
+		changing = {} # path: (size, mtime, since when)
+		queued = set() # (path, size, mtime) of every file yielded by this run
+		resumed = self.watchQueue.countQueued()
+		if resumed:
+			self.log(F"Resuming {resumed} file(s) that were queued when the last watch stopped...")
+		self.log(F"Watching {folder} for new files, Ctrl+C to stop...")
+		try:
+			while True:
+				now = time.time()
+				next_scan = now + self.watchInterval
+				if self.recursive:
+					files = walkFiles(folder, self.batchExtensions, exclude=self.outputDir.resolve() if self.outputDir else None)
+				else:
+					files = folder.listfiles(self.batchExtensions)
+				listed = set()
+				for path in files:
+					if path.name.startswith('.'):
+						continue
+					try:
+						st = os.stat(path)
+					except OSError:
+						continue # Gone again
+					key = (str(path), st.st_size, st.st_mtime_ns)
+					listed.add(key)
+					if key in queued:
+						continue
+					watcher.add(path.parent)
+					state = self.watchQueue.getState(path, st)
+					if state in ('done', 'failed'):
+						continue
+					if state != 'queued': # Files queued by an earlier run were complete back then already.
+						seen = changing.get(key[0])
+						if seen is None or seen[:2] != key[1:]:
+							changing[key[0]] = (st.st_size, st.st_mtime_ns, now)
+							next_scan = min(next_scan, now + self.watchSettleSeconds)
+							continue
+						if now - seen[2] < self.watchSettleSeconds:
+							next_scan = min(next_scan, seen[2] + self.watchSettleSeconds)
+							continue
+					changing.pop(key[0], None)
+					queued.add(key)
+					self.watchQueue.queue(path, st)
+					if self.manifest and not self.force and self.isUpToDate(path, self.clip):
+						self.watchQueue.finish(path, key[1:]) # Encoded before, e.g by hand
+						continue
+					yield path, st
+				queued &= listed # Versions that are gone won't come back, no need to remember them.
+				self.forgetFolderListings() # Files may have been added to or removed from the folders meanwhile, they're listed again when needed.
+				watcher.wait(max(next_scan - time.time(), 0.1))
+		finally:
+			watcher.close()
+
+	def runJobs(self, jobs: Iterable[EncodeJob]) -> List[EncodeJob]:
+		'''Runs the jobs (a list, or a generator that's consumed as the jobs get started), returns all started jobs.'''
+		started = self.startedJobs
+		self.batchStarted = time.time()
+		if self.jobs <= 1:
+			try:
+				for job in jobs:
+					with self.progressLock:
+						started.append(job)
+					self.runJob(job)
+			except KeyboardInterrupt:
+				self.abortJobs(started)
+			return started
+
+		if isinstance(jobs, list):
+			if len(jobs) > 1:
+				self.log(F"Encoding {len(jobs)} files, {self.jobs} at a time...")
+		else:
+			self.log(F"Encoding files as they are found, {self.jobs} at a time...")
+		pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs)
+		pending = set()
+		try:
+			for job in jobs:
+				# Only queue a few jobs ahead, so files are discovered no faster than they get encoded.
+				while len(pending) >= self.jobs * 2:
+					pending = concurrent.futures.wait(pending, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED).not_done
+				with self.progressLock:
+					started.append(job)
+				pending.add(pool.submit(self.runJob, job))
+			# Wait in small steps, so Ctrl+C gets through on every platform.
+			while len(pending):
+				pending = concurrent.futures.wait(pending, timeout=0.5).not_done
+		except KeyboardInterrupt:
+			self.abortJobs(started)
+		finally:
+			pool.shutdown(wait=False, cancel_futures=True)
+		return started
+
+	def abortJobs(self, jobs: List[EncodeJob]) -> None:
+		self.cancelled.set()
+		self.killProcesses()
+		with self.printLock:
+			print("\nInterrupted, stopped all encoders, removing unfinished files...")
+		for job in jobs:
+			for temp in job.TempFiles:
+				temp.unlink(missing_ok=True)
+			if not job.Outputs:
+				for partial in job.PartialOutputs:
+					partial.unlink(missing_ok=True)
+		exit(1)
+
+	def runTool(self, cmd: List[str], input_data: bytes = None) -> bytes:
+		p = self.startProcess(cmd, stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		try:
+			output, error = p.communicate(input_data)
+		finally:
+			self.endProcess(p)
+		if p.returncode != 0:
+			self.log(error.decode("utf-8", errors="replace"))
+			self.log(F"Command was: {subprocess.list2cmdline(cmd)}")
+			raise EncodeError(F"{cmd[0]} failed with exit code {p.returncode}, error above.")
+		return output
+
+	def compressCover(self, file_path: Path, image_data: bytes = None) -> Path:
+		'''
+			Compressed (JPEG) version of the cover image, from the file or image_data if given.
+			Every distinct image is compressed once, tracks sharing it (and jobs running at the same time) get the same file.
+		'''
+		if image_data is None:
+			image_data = file_path.read_bytes()
+		digest = hashlib.sha1(image_data).hexdigest()
+		job = getattr(self.localState, 'job', None)
+		if job:
+			job.Covers.append(digest)
+		with self.coverLock:
+			pending = self.covers.get(digest)
+			if pending is None:
+				pending = self.covers[digest] = concurrent.futures.Future()
+				owner = True
+			else:
+				owner = False
+		if not owner:
+			return pending.result()
+
+		try:
+			out_path = self.coverDir.joinpath(F"{digest}_{self.COVER_SIZE}.jpg")
+			if out_path.exists():
+				self.log(F"Using cached cover of {file_path}")
+			else:
+				self.log(F"Compressing cover {file_path}...")
+				cmd = [
+					'ffmpeg',
+					'-hide_banner',
+					'-nostdin',
+					'-loglevel',
+					'error',
+					'-i',
+					'pipe:0',
+					'-an',
+					'-pix_fmt',
+					'yuvj444p',
+					'-c:v',
+					'mjpeg',
+					'-compression_level',
+					'75',
+					'-s',
+					F'{self.COVER_SIZE}x{self.COVER_SIZE}',
+					'-f',
+					'mjpeg',
+					'-',
+				]
+				try:
+					jpeg = self.runTool(cmd, image_data)
+				except EncodeError:
+					raise EncodeError(F"Compressing Cover '{file_path}' failed, error above.")
+				if not jpeg:
+					raise EncodeError("Cover compression failed, maybe missing WebP or JPEG support in ffmpeg? Or corrupt cover image.")
+				# Written under a unique temporary name first, so other runs (or machines) sharing the cache never see half a file.
+				fd, temp_name = tempfile.mkstemp(dir=str(out_path.parent), prefix=F".{out_path.name}.", suffix=".tmp")
+				temp_out_path = Path(temp_name)
+				self.trackTempFile(temp_out_path)
+				try:
+					with os.fdopen(fd, 'wb') as f:
+						f.write(jpeg)
+					os.replace(temp_out_path, out_path)
+				except BaseException:
+					temp_out_path.unlink(missing_ok=True)
+					raise
+		except BaseException as e:
+			pending.set_exception(e)
+			raise
+		pending.set_result(out_path)
+		return out_path
+
+	def extractCover(self, file_path: Path, stream: dict) -> bytes:
+		'''Raw image data of the embedded cover stream, copied as is.'''
 		cmd = [
 			'ffmpeg',
-			'-y',
+			'-hide_banner',
+			'-nostdin',
+			'-loglevel',
+			'error',
 			'-i',
 			str(file_path),
-			'-an',
-			'-pix_fmt',
-			'yuvj444p',
-			'-c:v',
-			'mjpeg',
-			'-compression_level',
-			'75',
-			'-s',
-			'300x300',
-			str(temp_out_path),
+			'-map',
+			F"0:{stream['index']}",
+			'-c',
+			'copy',
+			'-frames:v',
+			'1',
+			'-f',
+			'image2pipe',
+			'-',
 		]
+		return self.runTool(cmd)
+
+	def fileVersion(self, file_path: Path) -> tuple:
+		'''Path, size and modification time, e.g a watched folder can get a new version of a file while the old one is still remembered.'''
 		try:
-			_ = subprocess.check_output(cmd, stderr=subprocess.STDOUT)
-		except subprocess.CalledProcessError as e:
-			print(e.output.decode("utf-8"))
-			print(F"\n Compressing Cover '{file_path}' Failed, error above, command was:")
-			print(subprocess.list2cmdline(cmd))
-			exit(1)
-		return temp_out_path
+			st = os.stat(file_path)
+		except OSError:
+			return (str(file_path), None, None)
+		return (str(file_path), st.st_size, st.st_mtime_ns)
 
 	def getFfprobe(self, file_path: Path) -> dict:
+		'''ffprobe data of the file, probed at most once per run (and version of the file), and only again on later runs if the file changed.'''
+		# Clips of the same file start at the same time, the first one probes and the others wait for its result.
+		key = self.fileVersion(file_path)
+		with self.probeLock:
+			pending = self.probes.get(key)
+			if pending is None:
+				pending = self.probes[key] = concurrent.futures.Future()
+				owner = True
+			else:
+				owner = False
+		if not owner:
+			return pending.result()
+
+		try:
+			probe = None
+			if self.probeCache:
+				try:
+					probe = self.probeCache.get(file_path)
+				except (OSError, sqlite3.Error) as e:
+					self.log(F"Reading the probe cache failed: {e}")
+			if probe is None:
+				probe = self.runFfprobe(file_path)
+				if self.probeCache:
+					try:
+						self.probeCache.put(file_path, probe)
+					except (OSError, sqlite3.Error) as e:
+						self.log(F"Writing the probe cache failed: {e}")
+		except BaseException as e:
+			pending.set_exception(e)
+			raise
+		pending.set_result(probe)
+		return probe
+
+	def runFfprobe(self, file_path: Path) -> dict:
 		cmd = [
 			'ffprobe',
 			'-show_streams',
@@ -197,13 +1517,17 @@ class OpusMaker:
 		try:
 			rawJson = subprocess.check_output(cmd, stderr=subprocess.STDOUT)
 		except subprocess.CalledProcessError as e:
-			print(e.output.decode("utf-8"))
-			print("\nAquiring FFProbe data failed, see error above, command was:")
-			print(subprocess.list2cmdline(cmd))
-			exit(1)
+			self.log(e.output.decode("utf-8"))
+			self.log(F"Command was: {subprocess.list2cmdline(cmd)}")
+			raise EncodeError("Aquiring FFProbe data failed, see error above.")
 		return json.loads(rawJson)
 
 	def getCoverFromFolder(self, file_path: Path) -> Path:
+		# Every track of a folder gets the same answer, so each folder is only listed once.
+		folder = str(file_path.parent)
+		with self.coverLock:
+			if folder in self.folderCovers:
+				return self.folderCovers[folder]
 		foundFile = None
 		for file in file_path.parent.listfiles(('.jpg', '.jpeg', '.png', '.webp',)):
 			if any(w in file.name.lower() for w in ('cover', 'folder', 'artwork')):
@@ -211,121 +1535,726 @@ class OpusMaker:
 				break
 			elif not foundFile:
 				foundFile = file
+		with self.coverLock:
+			self.folderCovers[folder] = foundFile
 		return foundFile
 
-	def hasCover(self, file_path) -> bool:
-		probe = self.getFfprobe(file_path)
+	def getCoverStream(self, probe: dict) -> dict:
 		for stream in probe["streams"]:
 			if stream['codec_type'] == 'video':
 				if 'tags' in stream and 'comment' in stream['tags']:
 					if 'cover' in stream['tags']['comment'].lower():
-						return True
-		return False
-
-	def getCoverFromFile(self, file_path: Path) -> Path:
-		if self.hasCover(file_path):
-			return self.compressCover(file_path)
+						return stream
 		return None
 
-	def encodeFile(self, original_file: Path) -> Path:
-		output_file_path = original_file.parent.joinpath(original_file.name.replace(" ", "_").replace("_-_", "_")).change_suffix(".opus")
-		if output_file_path.exists():
-			_output_file_path = output_file_path
-			_append_num = 1
-			while _output_file_path.exists():
-				if _append_num >= 10000:
+	def hasCover(self, file_path, probe: dict = None) -> bool:
+		if probe is None:
+			probe = self.getFfprobe(file_path)
+		return self.getCoverStream(probe) is not None
+
+	def getCoverFromFile(self, file_path: Path, probe: dict = None) -> Path:
+		# Clips of the same file all get the same cover, so it's only extracted once.
+		key = self.fileVersion(file_path)
+		with self.coverLock:
+			pending = self.fileCovers.get(key)
+			if pending is None:
+				pending = self.fileCovers[key] = concurrent.futures.Future()
+				owner = True
+			else:
+				owner = False
+		if not owner:
+			return pending.result()
+
+		try:
+			if probe is None:
+				probe = self.getFfprobe(file_path)
+			stream = self.getCoverStream(probe)
+			cover = self.compressCover(file_path, self.extractCover(file_path, stream)) if stream else None
+		except BaseException as e:
+			pending.set_exception(e)
+			raise
+		pending.set_result(cover)
+		return cover
+
+	def getOutputFolder(self, input_file: Path) -> Path:
+		'''In recursive mode the sub-folders of the input folder are mirrored in the output folder.'''
+		if not self.outputDir:
+			return input_file.parent
+		if self.recursive and self.inputPath.is_dir():
+			return self.outputDir.joinpath(input_file.parent.relative_to(self.inputPath))
+		return self.outputDir
+
+	def startTransfers(self) -> None:
+		self.transferQueue = queue.Queue(maxsize=self.transferJobs * 2)
+		self.transferThreads = [threading.Thread(target=self.transferWorker, daemon=True) for _ in range(self.transferJobs)]
+		for thread in self.transferThreads:
+			thread.start()
+
+	def finishTransfers(self) -> None:
+		for _ in self.transferThreads:
+			self.transferQueue.put(None)
+		for thread in self.transferThreads:
+			while thread.is_alive():
+				thread.join(0.5) # In small steps, so Ctrl+C gets through on every platform.
+
+	def transferWorker(self) -> None:
+		while True:
+			job = self.transferQueue.get()
+			if job is None or self.cancelled.is_set():
+				return
+			self.localState.job = job
+			try:
+				for index, profile in enumerate(self.profiles[:len(job.Outputs)]):
+					try:
+						self.moveOutput(job, index, profile)
+					except Exception as e:
+						# Not just OSErrors, e.g the manifest can't be written (sqlite3.Error): a worker that dies would stall the whole run.
+						error = str(e) if isinstance(e, (OSError, shutil.Error)) else F"{type(e).__name__}: {e}"
+						job.Error = F"Moving the output file {job.Outputs[index]} failed: {error}"
+						self.log(job.Error)
+						self.keepOutput(job.Outputs[index])
+				if self.watchQueue and self.copyLink and not job.Error:
+					# Watching doesn't end, so share links are handed out file by file.
+					share_links = [self.baseUrl.format(file_name=output.name) for output in job.Outputs]
+					self.log("Share link(s): " + ", ".join(share_links))
+					try:
+						pyperclip.copy(os.linesep.join(share_links))
+					except Exception as e: # e.g no clipboard on a headless machine (PyperclipException)
+						self.log(F"Copying the share link(s) to the clip-board failed: {e}")
+			finally:
+				self.releaseLocalOutputs(job)
+				if self.watchQueue:
+					try:
+						self.watchQueue.finish(job.Input, job.Version, job.Error)
+					except sqlite3.Error as e:
+						self.log(F"Updating the watch queue failed: {e}")
+					self.forgetJob(job)
+				self.localState.job = None
+
+	def keepOutput(self, path: Path) -> None:
+		'''Encoded files that couldn't be moved stay in the temporary folder (instead of being removed with it), so the encode isn't lost.'''
+		try:
+			if path.parent == self.tempDir and path.exists():
+				with self.transferLock:
+					self.keptOutputs.append(path)
+		except OSError:
+			pass
+
+	def removeTempDir(self) -> None:
+		if self.keptOutputs:
+			print(F"Kept {len(self.keptOutputs)} encoded file(s) that couldn't be moved to the output folder in: {self.tempDir}")
+			for path in self.tempDir.iterdir():
+				if path.is_dir():
+					shutil.rmtree(str(path), ignore_errors=True)
+				elif path not in self.keptOutputs:
+					path.unlink(missing_ok=True)
+			return
+		shutil.rmtree(str(self.tempDir), ignore_errors=True)
+
+	def releaseLocalOutputs(self, job: EncodeJob) -> None:
+		'''The local names of the job are free again once its files are moved (or it failed).'''
+		with self.transferLock:
+			for path in job.PartialOutputs:
+				self.localOutputs.discard(path)
+
+	def getOutputNames(self, folder: Path) -> set:
+		'''
+			Names in the output folder, listed once per run (a single round trip on network paths) and kept up to date with our own outputs.
+			Watching lists them again after every scan of the watched folder, see forgetFolderListings().
+		'''
+		key = os.path.normcase(str(folder))
+		names = self.outputNames.get(key)
+		if names is None:
+			with os.scandir(folder) as it:
+				names = self.outputNames[key] = {os.path.normcase(entry.name) for entry in it}
+		return names
+
+	def forgetFolderListings(self) -> None:
+		'''
+			Drops the folder listings: names deleted from an output folder are free again (reserved names are on disk, so they stay taken),
+			and a cover file added to, replaced in or removed from a source folder is noticed.
+		'''
+		with self.transferLock:
+			self.outputNames.clear()
+		with self.coverLock:
+			self.folderCovers.clear()
+
+	def releaseOutputName(self, path: Path) -> None:
+		with self.transferLock:
+			names = self.outputNames.get(os.path.normcase(str(path.parent)))
+			if names is not None:
+				names.discard(os.path.normcase(path.name))
+
+	def reserveOutputPath(self, path: Path) -> Path:
+		'''
+			Picks the final output name, the first of name, name_1, name_2... that's free, and reserves it by creating it (empty) exclusively,
+			which fails if another run (or machine) took the name since the folder was listed. The output is then renamed over it.
+		'''
+		with self.transferLock:
+			names = self.getOutputNames(path.parent)
+			candidate = path
+			append = 1
+			while True:
+				name = os.path.normcase(candidate.name)
+				if name not in names:
+					names.add(name)
+					try:
+						os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+						return candidate
+					except FileExistsError:
+						pass
+				if append >= 10000:
 					# Who would ever keep 10000 re-encodes of the same file-name in the same folder!?
-					raise Exception("Failed to find suitable alternative name for output file")
-				_output_file_path = _output_file_path.append_stem(F"_{_append_num}")
-				_append_num += 1
-			output_file_path = _output_file_path
+					raise OSError("Failed to find suitable alternative name for output file")
+				candidate = path.append_stem(F"_{append}")
+				append += 1
+
+	def moveOutput(self, job: EncodeJob, index: int, profile: EncodeProfile) -> Path:
+		timer = time.time()
+		out_file = job.Outputs[index]
+		erange = self.getEncodeRange(job.Clip or self.clip, profile)
+		settings = self.getEncodeSettings(profile)
+		output_folder = self.getOutputFolder(job.Input)
+		self.log(F"Moving output file to: {output_folder}")
+		output_folder.mkdir(parents=True, exist_ok=True)
+		new_output_file_path = output_folder.joinpath(self.getOutputName(job.Input, job.Clip or self.clip, profile))
+		previous = self.manifest.get(job.Input, erange) if self.manifest else None
+
+		reserved = False
+		if previous:
+			# Re-encode of a changed source (or with changed settings), replaces its earlier output.
+			new_output_file_path = previous['output']
+		elif not self.overwriteExisting:
+			new_output_file_path = self.reserveOutputPath(new_output_file_path)
+			reserved = True
+
+		# Copied under a unique temporary name first, so an interrupted transfer never leaves a cut off file behind,
+		# then renamed over the reserved (or replaced) name in one go.
+		fd, temp_name = tempfile.mkstemp(dir=str(new_output_file_path.parent), prefix=F".{new_output_file_path.stem}.", suffix=".part")
+		os.close(fd)
+		temp_path = Path(temp_name)
+		job.TempFiles.append(temp_path)
+		if reserved:
+			job.TempFiles.append(new_output_file_path) # Only until the output is in place, an interrupted move removes the reservation too.
+		try:
+			shutil.move(out_file, temp_path)
+			os.replace(temp_path, new_output_file_path)
+		except BaseException:
+			temp_path.unlink(missing_ok=True)
+			if reserved:
+				new_output_file_path.unlink(missing_ok=True)
+				self.releaseOutputName(new_output_file_path)
+			raise
+		if reserved:
+			job.TempFiles.remove(new_output_file_path)
+		job.Outputs[index] = new_output_file_path
+		if self.manifest:
+			self.manifest.record(job.Input, erange, settings, new_output_file_path)
+		self.addTiming('move', time.time() - timer)
+		return new_output_file_path
+
+	def isUpToDate(self, in_file: Path, clip: EncodeClip) -> bool:
+		'''Whether the manifest lists every rendition of the clip as encoded from the current version of the file.'''
+		return all(self.manifest.isUpToDate(in_file, self.getEncodeRange(clip, profile), self.getEncodeSettings(profile)) for profile in self.profiles)
+
+	def getEncodeSettings(self, profile: EncodeProfile) -> str:
+		'''Everything that changes the output of a source, to tell whether an earlier output is still up to date.'''
+		return json.dumps({
+			'bitrate': profile.Bitrate,
+			'vbr': profile.Vbr,
+			'cover': self.withCover,
+			'engine': self.engine,
+		}, sort_keys=True)
+
+	def getEncodeRange(self, clip: EncodeClip, profile: EncodeProfile) -> str:
+		'''What the manifest tells outputs of the same source apart by: the range, and the rendition if there are several.'''
+		erange = clip.Range
+		if self.renditions:
+			erange += profile.Suffix
+		return erange
+
+	def getAudioStream(self, probe: dict) -> dict:
+		for stream in probe.get("streams", []):
+			if stream.get('codec_type') == 'audio':
+				return stream
+		return None
 
+	def getEncodeDuration(self, probe: dict, clip: EncodeClip) -> float:
+		'''Duration in seconds of what's going to be encoded, the selected range if there is one, None if unknown.'''
+		try:
+			duration = float(probe["format"]["duration"])
+		except (KeyError, ValueError):
+			return None
+		if clip.End:
+			duration = min(duration, clip.EndSeconds)
+		duration -= clip.StartSeconds
+		return max(duration, 0.0)
+
+	def buildPipeline(self, original_file: Path, outputs: List[tuple], cover: Path = None, segment: EncodeSegment = None, clip: EncodeClip = None) -> List[PipelineStage]:
+		'''
+			Processes to encode the file (or the clip of it) into every (EncodeProfile, output path) of outputs, decoding it only once:
+			with libopus one ffmpeg writes all outputs, with opusenc the decoded audio is copied to one opusenc per output.
+		'''
+		decode = [
+			'ffmpeg',
+			'-hide_banner',
+			'-nostdin',
+			'-loglevel',
+			'error',
+			'-progress',
+			'pipe:2',
+		]
+		if segment and segment.Seek:
+			decode.extend(['-ss', str(segment.Seek)])
+		elif not segment and clip and clip.Start:
+			# Seeking the input skips straight to the clip instead of decoding everything before it, ffmpeg still cuts it sample accurately.
+			decode.extend(['-ss', clip.Start])
+		decode.extend(['-i', str(original_file)])
+		# Tags and cover only go into the first segment, that's where the header of the stitched file comes from.
+		with_tags = not segment or segment.Index == 0
+		metadata = None
+		# Output options, given once per output.
+		output_options = []
+		if self.engine == 'libopus':
+			# Cover art goes in as METADATA_BLOCK_PICTURE comment, through a second (ffmetadata) input on stdin.
+			metadata = ';FFMETADATA1\n'
+			if cover and with_tags:
+				metadata += F'METADATA_BLOCK_PICTURE={ffmetadataEscape(pictureBlock(cover.read_bytes(), self.COVER_SIZE, self.COVER_SIZE))}\n'
+			decode.extend(['-f', 'ffmetadata', '-i', 'pipe:0'])
+			output_options.extend(['-map_metadata', '0' if with_tags else '-1', '-map_metadata', '1'])
+		else:
+			output_options.extend(['-map_metadata', '0' if with_tags else '-1'])
+
+		if segment:
+			# Resampled to 48kHz (what Opus uses internally) and cut by sample, so the segments line up exactly.
+			trim = F'aresample=48000,atrim=start_sample={segment.StartSample}'
+			if segment.EndSample is not None:
+				trim += F':end_sample={segment.EndSample}'
+			output_options.extend(['-af', trim + ',asetpts=PTS-STARTPTS'])
+		elif clip and clip.End:
+			# Timestamps start at 0 after an input seek, so the end is given as length.
+			output_options.append('-t')
+			output_options.append(F"{clip.EndSeconds - clip.StartSeconds:.6f}")
+
+		if self.engine == 'libopus':
+			for profile, output_file_path in outputs:
+				decode.extend(output_options)
+				decode.extend([
+					'-vn',
+					'-c:a',
+					'libopus',
+					'-b:a',
+					F'{profile.Bitrate}k',
+					'-vbr',
+					'on' if profile.Vbr else 'off',
+					'-f',
+					'opus',
+					'-y',
+					str(output_file_path),
+				])
+			return [PipelineStage("Decode+Encode (ffmpeg/libopus)", decode, metadata.encode('utf-8'), progress=True)]
+
+		decode.extend(output_options)
+		if self.engine == 'opusenc-flac':
+			if segment:
+				decode.append('-vn')
+			decode.extend([
+				'-f',
+				'flac',
+				'-',
+			])
+		else:
+			decode.extend([
+				'-vn',
+				'-c:a',
+				'pcm_f32le',
+				'-f',
+				'wav',
+				'-',
+			])
+		stages = [PipelineStage("Decode (ffmpeg)", decode, progress=True)]
+		for profile, output_file_path in outputs:
+			encode = [
+				'opusenc',
+				'-',
+				'--bitrate',
+				str(profile.Bitrate),
+			]
+			if self.engine != 'opusenc-flac':
+				# ffmpeg can't fill in the WAV sizes when writing to a pipe.
+				encode.append('--ignorelength')
+			if profile.Vbr:
+				encode.append('--vbr')
+			else:
+				encode.append('--hard-cbr')
+			if cover and with_tags:
+				encode.append('--picture')
+				encode.append(str(cover))
+			encode.append(str(output_file_path))
+			name = F"Encode (opusenc {profile.Bitrate:g}k)" if len(outputs) > 1 else "Encode (opusenc)"
+			stages.append(PipelineStage(name, encode, upstream=stages[0]))
+		return stages
+
+	def getOutputName(self, original_file: Path, clip: EncodeClip, profile: EncodeProfile) -> str:
+		'''File name of the output, e.g Some_Track_3-07_3-15_64k.opus (the time only with APPEND_TIME, the bitrate only with RENDITIONS).'''
+		name = original_file.name.replace(" ", "_").replace("_-_", "_")
+		stem = name[:-len(original_file.suffix)] if original_file.suffix else name
+		if self.appendTime:
+			stem += clip.NameSuffix
+		if self.renditions:
+			stem += profile.Suffix
+		return stem + ".opus"
+
+	def getLocalOutputPath(self, original_file: Path, clip: EncodeClip, profile: EncodeProfile) -> Path:
+		'''Where the file gets encoded to, in the private temporary folder, before it's moved to the output folder.'''
+		output_file_path = self.tempDir.joinpath(self.getOutputName(original_file, clip, profile))
+		# The folder is private to this run, so the only names that can be taken are those of other jobs
+		# (e.g clips of the same file, or same named tracks of different albums), no need to ask the file system.
+		with self.transferLock:
+			candidate = output_file_path
+			append = 1
+			while candidate in self.localOutputs:
+				candidate = output_file_path.append_stem(F"_{append}")
+				append += 1
+			self.localOutputs.add(candidate)
+		return candidate
+
+	def encodeFile(self, original_file: Path) -> List[Path]:
+		'''Encodes the file into every rendition (probe, cover and decode are shared), returns the output files.'''
+		job = getattr(self.localState, 'job', None)
+		clip = (job.Clip if job else None) or self.clip
+		outputs = [(profile, self.getLocalOutputPath(original_file, clip, profile)) for profile in self.profiles]
+		output_file_path = outputs[0][1]
+
+		timer = time.time()
+		probe = self.checkInput(original_file) # Batches were checked before, so this is only a look-up
+		self.addTiming('probe', time.time() - timer)
+		audio = self.getAudioStream(probe)
+		duration = self.getEncodeDuration(probe, clip)
+		if job:
+			job.Duration = duration
+		timer = time.time()
 		cover: Path = None
 		if self.withCover:
-			cover = self.getCoverFromFile(original_file)
+			cover = self.getCoverFromFile(original_file, probe)
 			if not cover:
-				cover = self.getCoverFromFolder(original_file)
-				if cover:
-					cover = self.compressCover(cover)
-					if not cover.exists():
-						print("Cover compression failed, maybe missing WebP or JPEG support in ffmpeg? Or corrupt cover image file.")
-						exit(1)
-					else:
-						print(F"Using cover file '{cover}' in folder: {cover.parent}")
-			else:
-				if not cover.exists():
-					print("Cover compression failed, maybe missing WebP or JPEG support in ffmpeg? Or corrupt audio file.")
-					exit(1)
+				folder_cover = self.getCoverFromFolder(original_file)
+				if folder_cover:
+					cover = self.compressCover(folder_cover)
+					self.log(F"Using cover file '{folder_cover.name}' in folder: {folder_cover.parent}")
 				else:
-					print(F"Using cover '{cover}' from audio metadata in: {original_file}")
-		else:
-			print("No cover found.")
+					self.log("No cover found.")
+			else:
+				self.log(F"Using cover from audio metadata in: {original_file}")
+		self.addTiming('cover', time.time() - timer)
 
-		cmd1 = [
-			'ffmpeg',
-			'-loglevel',
-			'panic',
-			'-i',
-			str(original_file),
-			'-map_metadata',
-			'0',
-		]
-		if self.startTime:
-			cmd1.append('-ss')
-			cmd1.append(self.startTime)
+		erange = clip.Description
 
-		if self.endTime:
-			cmd1.append('-to')
-			cmd1.append(self.endTime)
+		channels = audio.get('channels')
+		if len(outputs) > 1:
+			self.log(F"Encoding{erange}{F' ({channels} channels)' if channels else ''} into {len(outputs)} renditions: {', '.join(str(path) for _, path in outputs)}...")
+		else:
+			self.log(F"Encoding{erange}{F' ({channels} channels)' if channels else ''} into file {output_file_path}...")
+		if job:
+			job.PartialOutputs = [path for _, path in outputs]
+		segments = self.getSegmentCount(duration, job)
+		if segments > 1:
+			self.encodeSplit(original_file, output_file_path, cover, duration, segments, clip, job)
+			return [output_file_path]
+
+		stages = self.buildPipeline(original_file, outputs, cover, clip=clip)
+		pipeline = EncodePipeline(self, stages, duration, lambda position, speed: self.reportProgress(job, position, speed))
+		try:
+			pipeline.run()
+		except EncodeError:
+			for _, path in outputs:
+				path.unlink(missing_ok=True)
+			raise
+		finally:
+			if job:
+				job.Stages = [stage.toReport() for stage in stages if stage.Started]
+		self.log(pipeline.summary())
+
+		return [path for _, path in outputs]
+
+	def getSegmentCount(self, duration: float, job: EncodeJob = None) -> int:
+		'''
+			How many segments to split the file into, 1 if it's not worth it (or batch-encoding, where the jobs already keep all cores busy,
+			or encoding several renditions, where their encoders already run in parallel).
+		'''
+		if not self.split or self.jobs <= 1 or not duration or (job and job.Batch) or len(self.profiles) > 1:
+			return 1
+		return max(min(self.jobs, int(duration // self.splitMinSeconds)), 1)
 
-		cmd1.extend([
-			'-f',
-			'flac',
-			'-',
-		])
-		cmd2 = [
-			'opusenc',
-			'-',
-			'--bitrate',
-			str(self.bitrate),
-		]
-		if self.opusVbr:
-			cmd2.append('--vbr')
-		if cover:
-			cmd2.append('--picture')
-			cmd2.append(str(cover))
-		cmd2.append(str(output_file_path))
-
-		erange = ""
-		if start_time and end_time:
-			erange = F" from {start_time} to {end_time}"
-		elif start_time:
-			erange = F" from {start_time} to end"
-		elif end_time:
-			erange = F" from start to {end_time}"
-
-		print(F"Encoding{erange} into file {output_file_path}...")
-		p = subprocess.Popen(cmd1, shell=False, bufsize=0, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-		p2 = subprocess.Popen(cmd2, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, stdin=p.stdout)
-		stdo, stde = p2.communicate()
-
-		if cover:
-			cover.unlink()
-
-		return output_file_path
+	def planSegments(self, output_file_path: Path, duration: float, count: int, clip: EncodeClip) -> List[EncodeSegment]:
+		'''
+			Segment boundaries are put where the kept packets of each segment start and end exactly,
+			i.e the first boundary at a multiple of the packet size minus the pre-skip, the others a multiple of the packet size apart.
+			Every segment but the first starts SPLIT_PREROLL early, so its encoder is settled by the time its kept packets begin,
+			and every segment but the last runs SPLIT_TAIL long, so its encoder sees the real audio ahead instead of silence.
+		'''
+		rate = self.SPLIT_SAMPLE_RATE
+		frame = self.SPLIT_FRAME_SIZE
+		pre_skip = self.SPLIT_PRE_SKIP
+		total = int(duration * rate)
+		length = max(round(total / count / frame), 1) * frame
+		first = round((length + pre_skip) / frame) * frame - pre_skip
+		boundaries = [0] + [first + length * i for i in range(count - 1)] + [None]
+		offset = round(clip.StartSeconds * rate)
+		end = round(clip.EndSeconds * rate) if clip.End else None
+
+		segments = []
+		for i in range(count):
+			start = offset + boundaries[i] - (self.SPLIT_PREROLL if i else 0)
+			seek = max(start // rate - 1, 0) # A second early, so resampler start-up effects fall into the part that's cut off.
+			if boundaries[i + 1] is None:
+				stop = end
+			else:
+				stop = offset + boundaries[i + 1] + self.SPLIT_TAIL
+				if end is not None:
+					stop = min(stop, end)
+			# The segment's own audio starts after the pre-skip (and pre-roll), the first segment keeps its pre-skip packet(s) though.
+			content_start = pre_skip + (self.SPLIT_PREROLL if i else 0)
+			keep_start = content_start if i else 0
+			keep_end = None if boundaries[i + 1] is None else content_start + boundaries[i + 1] - boundaries[i]
+			segments.append(EncodeSegment(i, boundaries[i], seek, start - seek * rate, None if stop is None else stop - seek * rate, keep_start, keep_end,
+				output_file_path.change_name(F".{output_file_path.stem}.segment{i}.opus")))
+		return segments
+
+	def encodeSplit(self, original_file: Path, output_file_path: Path, cover: Path, duration: float, count: int, clip: EncodeClip, job: EncodeJob = None) -> None:
+		segments = self.planSegments(output_file_path, duration, count, clip)
+		self.log(F"Splitting into {count} segments of about {formatSeconds(duration / count)}, encoding them in parallel...")
+		lock = threading.Lock()
+		stages = []
+		pipelines = []
+		stopped = threading.Event()
+
+		def progress(segment: EncodeSegment, position: float, speed: float) -> None:
+			segment.Position = position
+			self.reportProgress(job, sum(x.Position for x in segments), speed * count if speed else None)
+
+		def encodeSegment(segment: EncodeSegment) -> EncodePipeline:
+			segment_stages = self.buildPipeline(original_file, [(self.profiles[0], segment.Output)], cover, segment)
+			for stage in segment_stages:
+				stage.Name += F" #{segment.Index + 1}"
+			with lock:
+				stages.extend(segment_stages)
+			pipeline = EncodePipeline(self, segment_stages, None, lambda position, speed: progress(segment, position, speed))
+			with lock:
+				if stopped.is_set():
+					raise EncodeError("Stopped, another segment failed.")
+				pipelines.append(pipeline)
+			pipeline.run()
+			return pipeline
+
+		for segment in segments:
+			if job:
+				job.TempFiles.append(segment.Output)
+		pool = concurrent.futures.ThreadPoolExecutor(max_workers=count)
+		try:
+			futures = [pool.submit(encodeSegment, segment) for segment in segments]
+			done, running = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+			errors = [f.exception() for f in futures if f in done and f.exception()]
+			if errors:
+				# No point in finishing the other segments, their pipelines are stopped (and kill whatever they start after this).
+				with lock:
+					stopped.set()
+					for pipeline in pipelines:
+						pipeline.failed.set()
+						pipeline.kill()
+				concurrent.futures.wait(running)
+				raise errors[0]
+			self.stitchSegments(segments, output_file_path)
+			wall = max(stage.Ended for stage in stages) - min(stage.Started for stage in stages)
+			cpu = sum(stage.CpuTime or 0 for stage in stages)
+			self.log(F"Encoded {count} segments: {wall:.1f}s ({cpu:.1f}s CPU), {duration / wall:.1f}x realtime")
+			if self.splitVerify:
+				self.verifySplit(original_file, output_file_path, [segment.Start for segment in segments[1:]], clip, job)
+		except EncodeError:
+			output_file_path.unlink(missing_ok=True)
+			raise
+		finally:
+			pool.shutdown(wait=False)
+			for segment in segments:
+				segment.Output.unlink(missing_ok=True)
+			if job:
+				job.Stages = [stage.toReport() for stage in stages if stage.Started]
+
+	def decodeWindows(self, path: Path, windows: List[tuple]) -> tuple:
+		'''Decodes the file (down-mixed to mono), returns the number of samples and the samples within each (start, end) window.'''
+		cmd = ['ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error', '-i', str(path), '-vn', '-ac', '1', '-ar', '48000', '-f', 'f32le', '-']
+		p = self.startProcess(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+		captured = [array.array('f') for _ in windows]
+		position = 0
+		rest = b''
+		try:
+			while True:
+				chunk = p.stdout.read(1 << 20)
+				if not chunk:
+					break
+				chunk = rest + chunk
+				usable = len(chunk) - len(chunk) % 4
+				rest = chunk[usable:]
+				samples = array.array('f', chunk[:usable])
+				for (start, end), window in zip(windows, captured):
+					if start < position + len(samples) and end > position:
+						window.extend(samples[max(start - position, 0):min(end - position, len(samples))])
+				position += len(samples)
+			p.wait()
+		finally:
+			self.endProcess(p)
+		if p.returncode != 0:
+			raise EncodeError(F"Decoding {path} for verification failed, command was: {subprocess.list2cmdline(cmd)}")
+		return position, captured
+
+	def verifySplit(self, original_file: Path, split_output: Path, boundaries: List[int], clip: EncodeClip, job: EncodeJob = None) -> None:
+		'''
+			Encodes the file again the normal (serial) way and checks that the split encode has exactly as many samples
+			and is aligned to it sample accurately around every segment boundary (no shift, gap or overlap).
+		'''
+		self.log("Verifying the split encode against a serial encode...")
+		serial_output = split_output.change_name(F".{split_output.stem}.serial.opus")
+		if job:
+			job.TempFiles.append(serial_output)
+		radius = 2400 # 50ms around each boundary
+		max_lag = 4
+		# Windows in the middle of the segments give the baseline, how close two encodes of the same audio get anyways.
+		middles = [(a + b) // 2 for a, b in zip([0] + boundaries, boundaries + [boundaries[-1] * 2 - (boundaries[-2] if len(boundaries) > 1 else 0)])]
+		points = boundaries + middles
+		windows = [(point - radius - max_lag, point + radius + max_lag) for point in points]
+		try:
+			EncodePipeline(self, self.buildPipeline(original_file, [(self.profiles[0], serial_output)], clip=clip)).run()
+			with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+				split_result = pool.submit(self.decodeWindows, split_output, windows)
+				serial_result = pool.submit(self.decodeWindows, serial_output, windows)
+				split_samples, split_windows = split_result.result()
+				serial_samples, serial_windows = serial_result.result()
+		finally:
+			serial_output.unlink(missing_ok=True)
+
+		if split_samples != serial_samples:
+			raise EncodeError(F"Split encode verification failed: {split_samples} samples, the serial encode has {serial_samples}.")
+		snrs = []
+		for point, x, y in zip(points, split_windows, serial_windows):
+			n = min(len(x), len(y)) - 2 * max_lag
+			if n <= 0:
+				continue
+			errors = {}
+			for lag in range(-max_lag, max_lag + 1):
+				errors[lag] = sum((x[max_lag + i] - y[max_lag + i + lag]) ** 2 for i in range(n))
+			signal = sum(y[max_lag + i] ** 2 for i in range(n))
+			if signal < 1e-6:
+				continue # Silence, nothing to align
+			best = min(errors, key=errors.get)
+			if best != 0:
+				raise EncodeError(F"Split encode verification failed: shifted by {best} samples at {formatSeconds(point / self.SPLIT_SAMPLE_RATE)} ({point}).")
+			snrs.append((point in boundaries, 10 * math.log10(signal / errors[0]) if errors[0] > 0 else float('inf')))
+		at_boundaries = [snr for boundary, snr in snrs if boundary]
+		in_middles = [snr for boundary, snr in snrs if not boundary]
+		self.log(F"Verified: {split_samples} samples like the serial encode, aligned at all {len(boundaries)} boundaries"
+			+ (F", lowest SNR to the serial encode {min(at_boundaries):.1f}dB around boundaries, {min(in_middles):.1f}dB within segments." if at_boundaries and in_middles else "."))
+
+	def stitchSegments(self, segments: List[EncodeSegment], output_file_path: Path) -> None:
+		'''
+			Joins the kept packets of all segments into one Ogg Opus stream, with the headers (and tags/cover) of the first segment.
+			Granule positions are recounted over the joined packets, the last one trimmed to the real length (end trimming).
+		'''
+		streams = [OggStream(segment.Output) for segment in segments]
+		first = streams[0]
+		for segment, stream in zip(segments, streams):
+			# Everything but the input sample rate (informational only) has to match.
+			if stream.PreSkip != self.SPLIT_PRE_SKIP or stream.Head[:12] + stream.Head[16:] != first.Head[:12] + first.Head[16:]:
+				raise EncodeError(F"Segment {segment.Index + 1} was encoded with a different pre-skip or channel layout ({stream.PreSkip}), can't stitch, try without --split.")
+
+		packets = []
+		for segment, stream in zip(segments, streams):
+			position = 0
+			kept = []
+			for packet in stream.Packets:
+				samples = opusPacketSamples(packet)
+				if position >= segment.KeepStart and (segment.KeepEnd is None or position + samples <= segment.KeepEnd):
+					if not kept and position != segment.KeepStart:
+						raise EncodeError(F"Segment {segment.Index + 1} doesn't start on a packet boundary, can't stitch gaplessly.")
+					kept.append(packet)
+					end = position + samples
+				position += samples
+			if not kept or (segment.KeepEnd is not None and end != segment.KeepEnd):
+				raise EncodeError(F"Segment {segment.Index + 1} doesn't end on a packet boundary (or is too short), can't stitch gaplessly.")
+			packets.extend(kept)
+
+		# The last segment's own end trimming says how much of its audio is real, that's where the stitched file ends too.
+		final_granule = self.SPLIT_PRE_SKIP + segments[-1].Start + (streams[-1].LastGranule - segments[-1].KeepStart)
+
+		temp_path = output_file_path.change_name(F".{output_file_path.name}.stitch")
+		with open(temp_path, 'wb') as f:
+			for page in first.HeaderPages:
+				f.write(page)
+			sequence = len(first.HeaderPages)
+			granule = 0
+			page_packets = []
+			page_segments = 0
+			for i, packet in enumerate(packets):
+				granule += opusPacketSamples(packet)
+				page_packets.append(packet)
+				page_segments += len(packet) // 255 + 1
+				last_packet = i == len(packets) - 1
+				# About one second of audio per page, like opusenc, keeps the page overhead low.
+				if last_packet or len(page_packets) >= 50 or page_segments + (len(packets[i + 1]) // 255 + 1) > 255:
+					f.write(oggPage(first.Serial, sequence, min(granule, final_granule), page_packets, 0x04 if last_packet else 0))
+					sequence += 1
+					page_packets = []
+					page_segments = 0
+		os.replace(temp_path, output_file_path)
 
 	def mime(self, path: Path) -> str:
-		ext = path.suffix.lstrip(".").lower()
-		custom_types = {
-			'ttf': 'font/ttf',
-			'otf': 'font/otf',
-		}
-		if ext in custom_types:
-			return custom_types[ext]
-
-		mime = magic.Magic(mime=True)
-		mime = mime.from_file(str(path))
-		return mime
+		ext = path.suffix.lower()
+		if ext in self.MEDIA_TYPES:
+			return self.MEDIA_TYPES[ext]
+
+		# Loading the libmagic database takes longer than looking at a file, so one handle is kept for the whole run.
+		# It can't be used by several threads at once.
+		with self.magicLock:
+			if self.magic is None:
+				self.magic = magic.Magic(mime=True)
+			return self.magic.from_file(str(path))
+
+	def checkInput(self, file_path: Path) -> dict:
+		'''
+			Makes sure the file can be encoded, returns its ffprobe data. The type (by extension, or by libmagic) sorts out obvious non-media files
+			without starting ffprobe, the (cached) probe decides for the rest.
+		'''
+		if self.haveMime and not self.ignoreMime:
+			try:
+				mime = self.mime(file_path)
+			except Exception as e: # magic raises its own MagicException, besides OSError
+				raise EncodeError(F"Can't read the type of {file_path}: {e}")
+			if not mime.startswith(("audio/", "video/")):
+				raise EncodeError(F"File {file_path} is no video or audio file ({mime}).")
+		try:
+			probe = self.getFfprobe(file_path)
+		except EncodeError as e:
+			raise EncodeError(F"Can't read {file_path}: {e}")
+		audio = self.getAudioStream(probe)
+		if not audio:
+			raise EncodeError(F"No audio stream found in: {file_path}")
+		if audio.get('channels') == 0: # ffprobe guessed the format (e.g by extension), but couldn't read any audio
+			raise EncodeError(F"The audio stream of {file_path} can't be read.")
+		return probe
+
+	def checkInputs(self, files: List[Path]) -> dict:
+		'''Checks all files at once (probes run in parallel) before anything is encoded, returns the files that can't be encoded, with the reason.'''
+		errors = {}
+		if len(files) > 1:
+			self.log(F"Checking {len(files)} files...")
+		with concurrent.futures.ThreadPoolExecutor(max_workers=max(self.jobs, os.cpu_count() or 1)) as pool:
+			for file_path, future in [(file_path, pool.submit(self.checkInput, file_path)) for file_path in files]:
+				try:
+					future.result()
+				except EncodeError as e:
+					errors[file_path] = str(e)
+				except Exception as e: # e.g ffprobe not installed (FileNotFoundError), reported like any other bad file
+					errors[file_path] = F"Can't read {file_path}: {type(e).__name__}: {e}"
+		return errors
 	
 	def __init__(self, input_path: Path,
 		start_time: str = None,
@@ -342,6 +2271,26 @@ class OpusMaker:
 		batch_extensions: bool = None,
 		overwrite_existing: bool = None,
 		append_time: bool = None,
+		jobs: int = 1,
+		engine: str = 'opusenc',
+		probe_cache: str = None,
+		cover_cache: str = None,
+		temp_path: str = None,
+		use_manifest: bool = False,
+		force: bool = False,
+		recursive: bool = False,
+		transfer_jobs: int = 2,
+		progress_interval: float = 0,
+		report_path: str = None,
+		quiet: bool = False,
+		split: bool = False,
+		split_min_seconds: float = 60,
+		split_verify: bool = False,
+		renditions: list = None,
+		clips: list = None,
+		watch: bool = False,
+		watch_interval: float = 10,
+		watch_settle_seconds: float = 5,
 	) -> None:
 		errors = []
 		# Settings
@@ -355,25 +2304,71 @@ class OpusMaker:
 		self.batchExtensions = batch_extensions
 		self.overwriteExisting = overwrite_existing
 		self.appendTime = append_time
+		self.jobs = jobs
+		self.engine = engine
 
 		# Commandline args
 		self.startTime = start_time
 		self.endTime = end_time
 		self.inputPath = input_path
+		self.clip = EncodeClip(start_time, end_time)
+		self.clips = []
 
 		# ###
 		self.haveMime = have_mime
+		self.magic = None
+		self.magicLock = threading.Lock()
 		self.havePyperclip = have_pyperclip
+		self.printLock = threading.Lock()
+		self.processLock = threading.Lock()
+		self.processes = set()
+		self.localState = threading.local()
+		self.cancelled = threading.Event()
+		self.probeLock = threading.Lock()
+		self.probes = {}
+		self.probeCache = None
+		self.coverLock = threading.Lock()
+		self.covers = {}
+		self.folderCovers = {}
+		self.fileCovers = {}
+		self.coverDir = None
+		self.tempDir = None
+		self.useManifest = use_manifest
+		self.force = force
+		self.transferJobs = transfer_jobs
+		self.transferQueue = None
+		self.transferThreads = []
+		self.transferLock = threading.Lock()
+		self.outputNames = {}
+		self.localOutputs = set()
+		self.keptOutputs = []
+		self.progressInterval = progress_interval
+		self.progressLock = threading.Lock()
+		self.startedJobs = []
+		self.batchStarted = time.time()
+		self.reportPath = report_path
+		self.quiet = quiet
+		self.split = split
+		self.splitMinSeconds = split_min_seconds
+		self.splitVerify = split_verify
+		self.renditions = renditions
+		self.profiles = []
+		self.recursive = recursive
+		self.manifest = None
+		self.watch = watch
+		self.watchInterval = watch_interval
+		self.watchSettleSeconds = watch_settle_seconds
+		self.watchQueue = None
 
 		if not self.bitrate or not isinstance(self.bitrate, (float, int)):
 			errors.append("The BITRATE setting has to be a number (float or int), default is 64.")
 
-		if not self.opusVbr or not isinstance(self.opusVbr, bool):
+		if not isinstance(self.opusVbr, bool):
 			errors.append("The OPUS_VBR setting has to be a boolean (True or False), default is True")
 
 		if self.outputDir and not isinstance(self.outputDir, str):
 			errors.append("The OUTPUT_PATH setting has string of an existing Path or None, default is None")
-		else:
+		elif self.outputDir:
 			self.outputDir = Path(output_dir)
 			if self.outputDir and not self.outputDir.exists():
 				errors.append("The OUTPUT_PATH setting has to be an existing proper Path, default is None")
@@ -390,11 +2385,113 @@ class OpusMaker:
 		if self.copyLink and not self.baseUrl:
 			errors.append("The COPY_SHARE_LINK setting requires BASE_URL to be set.")
 
+		if self.engine not in self.ENGINES:
+			errors.append(F"The ENCODE_ENGINE setting has to be one of: {', '.join(self.ENGINES)}, default is 'opusenc'.")
+
+		if not isinstance(self.jobs, int) or self.jobs < 0:
+			errors.append("The JOBS setting has to be a number of 0 or more, default is 1.")
+		elif self.jobs == 0:
+			self.jobs = os.cpu_count() or 1
+
+		if probe_cache and not isinstance(probe_cache, str):
+			errors.append("The PROBE_CACHE setting has to be a file path (string) or None, default is \"~/.cache/opus_maker/probe.db\"")
+		elif probe_cache:
+			try:
+				self.probeCache = ProbeCache(Path(os.path.expanduser(probe_cache)))
+			except (OSError, sqlite3.Error) as e:
+				print(F"Can't open the probe cache {probe_cache}, continuing without it: {e}")
+
+		if cover_cache and not isinstance(cover_cache, str):
+			errors.append("The COVER_CACHE setting has to be a folder path (string) or None, default is None")
+		elif cover_cache:
+			self.coverDir = Path(os.path.expanduser(cover_cache))
+			try:
+				self.coverDir.mkdir(parents=True, exist_ok=True)
+			except OSError as e:
+				errors.append(F"The COVER_CACHE folder can't be created: {e}")
+
+		if temp_path and (not isinstance(temp_path, str) or not os.path.isdir(os.path.expanduser(temp_path))):
+			errors.append("The TEMP_PATH setting has to be an existing folder (string) or None, default is None")
+
+		if not isinstance(self.progressInterval, (int, float)) or self.progressInterval < 0:
+			errors.append("The PROGRESS_INTERVAL setting has to be a number of seconds, 0 to turn it off, default is 5.")
+
+		if self.reportPath and not isinstance(self.reportPath, str):
+			errors.append("The REPORT_PATH setting has to be a file path (string) or None, default is None")
+
+		if not isinstance(self.split, bool):
+			errors.append("The SPLIT_LONG_FILES setting has to be a boolean (True or False), default is False")
+
+		if not isinstance(self.splitMinSeconds, (int, float)) or self.splitMinSeconds <= 0:
+			errors.append("The SPLIT_MIN_SEGMENT_SECONDS setting has to be a number of seconds, default is 60.")
+
+		if self.renditions is not None:
+			if not isinstance(self.renditions, (list, tuple)) or not len(self.renditions):
+				errors.append("The RENDITIONS setting has to be a list of (bitrate, vbr) pairs, e.g [(48, True), (128, False)], or None, default is None")
+			else:
+				for rendition in self.renditions:
+					if not isinstance(rendition, (list, tuple)) or len(rendition) != 2 or isinstance(rendition[0], bool) \
+						or not isinstance(rendition[0], (int, float)) or rendition[0] <= 0 or not isinstance(rendition[1], bool):
+						errors.append(F"The RENDITIONS entry {rendition!r} has to be a (bitrate, vbr) pair, e.g (64, True)")
+					else:
+						self.profiles.append(EncodeProfile(rendition[0], rendition[1]))
+				suffixes = [profile.Suffix for profile in self.profiles]
+				if len(set(suffixes)) != len(suffixes):
+					errors.append("The RENDITIONS setting lists the same bitrate and VBR setting more than once")
+		else:
+			self.profiles.append(EncodeProfile(self.bitrate, self.opusVbr))
+
+		if clips and (self.startTime or self.endTime):
+			errors.append("Either give a start/end time or a list of clips, not both.")
+		for times in (clips or [(self.startTime, self.endTime)]):
+			try:
+				start, end = times
+				clip = EncodeClip(start or None, end or None)
+				if clip.StartSeconds < 0 or (clip.End and clip.EndSeconds <= clip.StartSeconds):
+					errors.append(F"The clip{clip.Description} ends before it starts (or starts before 0).")
+				elif clips:
+					self.clips.append(clip)
+			except (TypeError, ValueError):
+				errors.append(F"The clip {times!r} has to be a (start, end) pair of times like 3:07 or 187.5, or None for the start/end of the file.")
+
+		if not isinstance(self.watchInterval, (int, float)) or self.watchInterval <= 0:
+			errors.append("The WATCH_INTERVAL setting has to be a number of seconds, default is 10.")
+
+		if not isinstance(self.watchSettleSeconds, (int, float)) or self.watchSettleSeconds < 0:
+			errors.append("The WATCH_SETTLE_SECONDS setting has to be a number of seconds, default is 5.")
+
+		if self.watch and self.clips:
+			errors.append("Watching a folder doesn't take a list of clips.")
+
+		if not isinstance(self.transferJobs, int) or self.transferJobs < 1:
+			errors.append("The TRANSFER_JOBS setting has to be a number of 1 or more, default is 2.")
+
+		if not isinstance(self.recursive, bool):
+			errors.append("The RECURSIVE setting has to be a boolean (True or False), default is False")
+
+		if not isinstance(self.useManifest, bool):
+			errors.append("The USE_MANIFEST setting has to be a boolean (True or False), default is True")
+
 		if len(errors):
 			print("Incorrect config settings:")
 			print("\t- " + "\n\t- ".join(errors))
 			exit(1)
 
+		# Files are encoded (and covers compressed) in a private folder on local storage, not next to the input file,
+		# which may well be a slow network share or read-only, and moved to their destination once done.
+		try:
+			self.tempDir = Path(tempfile.mkdtemp(prefix="opus_", dir=os.path.expanduser(temp_path) if temp_path else None))
+		except OSError as e:
+			print(F"Can't create a temporary folder in {temp_path or tempfile.gettempdir()}: {e}")
+			exit(1)
+		atexit.register(self.removeTempDir)
+		if not self.coverDir:
+			self.coverDir = self.tempDir.joinpath("covers")
+			self.coverDir.mkdir()
+
+		if self.inputPath is None:
+			return # Settings only, e.g for runBenchmark()
+
 		try:
 			self.inputPath = Path(self.inputPath)
 		except Exception:
@@ -405,16 +2502,21 @@ class OpusMaker:
 			print(F"File or Folder {self.inputPath} does not exist.")
 			exit(1)
 
-		if self.haveMime:
-			if not self.ignoreMime and not self .mime(self.inputPath).startswith(("audio/", "video/")):
-				print(F"File {self.inputPath} is no video or audio file.")
-				exit(1)
-
 		input_files = []
-		converted_files = []
-		share_links = []
 
-		if self.inputPath.is_dir():
+		if self.watch and not self.inputPath.is_dir():
+			print(F"Only folders can be watched, {self.inputPath} is not a folder.")
+			exit(1)
+		elif self.watch:
+			try:
+				self.watchQueue = WatchQueue(self.inputPath)
+			except (OSError, sqlite3.Error) as e:
+				print(F"Can't open the watch queue in {self.inputPath}: {e}")
+				exit(1)
+			input_files = self.watchFiles(self.inputPath)
+		elif self.inputPath.is_dir() and self.recursive:
+			input_files = walkFiles(self.inputPath, self.batchExtensions, exclude=self.outputDir.resolve() if output_dir else None)
+		elif self.inputPath.is_dir():
 			input_files = self.inputPath.listfiles(self.batchExtensions)
 		elif self.inputPath.is_file():
 			input_files.append(self.inputPath)
@@ -422,47 +2524,223 @@ class OpusMaker:
 			print(F"The input {self.inputPath} is not a file or a folder.")
 			exit(1)
 
-		# Either move them while encoding or after, I decided to do encoding first
-		# this way if the output Path is on the same Disk as the input file
-		# It will put less strain on it (if slow HDD or network Mount)
-
-		for in_file in input_files:
-			converted_files.append(self.encodeFile(in_file))
-
-		for out_file in converted_files:
-			print(F"Moving output file to: {self.outputDir}")
-			new_output_file_path = self.outputDir.joinpath(out_file.name)
-
-			if self.appendTime:
-				if self.startTime:
-					new_output_file_path = new_output_file_path.append_stem(F"_{self.startTime.replace(':', '-')}")
-					if self.endTime:
-						new_output_file_path = new_output_file_path.append_stem("_")
-				if self.endTime:
-					if not self.startTime:
-						new_output_file_path = new_output_file_path.append_stem("0-00_")
-					new_output_file_path = new_output_file_path.append_stem(F"{self.endTime.replace(':', '-')}")
-
-			if not self.overwriteExisting: # re-think logic and combine with encodeFile()
-				if new_output_file_path.exists():
-					new_output_file_path_append = 1
-					new_output_file_path_b = new_output_file_path
-					while new_output_file_path.exists():
-						if new_output_file_path_append >= 10000:
-							raise Exception("Failed to find suitable alternative name for output file")
-						new_output_file_path = new_output_file_path_b.append_stem(F"_{new_output_file_path_append}")
-						new_output_file_path_append += 1
-
-			shutil.move(out_file, new_output_file_path)
-
-			if self.copyLink:
-				share_links.append(self.baseUrl.format(file_name=new_output_file_path.name))
+		# A single file encoded next to itself doesn't get a manifest, a re-run encodes it again as it always did.
+		if self.useManifest and (output_dir or self.inputPath.is_dir()):
+			manifest_dir = self.outputDir if output_dir else self.inputPath
+			try:
+				self.manifest = EncodeManifest(manifest_dir)
+			except (OSError, sqlite3.Error) as e:
+				print(F"Can't open the manifest in {manifest_dir}, encoding everything: {e}")
+
+		# Every file is encoded once per clip (just once without clips), clips of the same file share its probe and cover.
+		clips = self.clips or [self.clip]
+		what = "clip(s)" if self.clips else "file(s)"
+		if isinstance(input_files, list):
+			items = [(in_file, clip) for in_file in input_files for clip in clips]
+		elif self.watch:
+			items = None # Jobs are made right from watchFiles(), see below
+		else:
+			items = ((in_file, clip) for in_file in input_files for clip in clips)
+
+		skipped = [0]
+		if self.manifest and not self.force and not self.watch: # Watching checks the manifest itself, see watchFiles()
+			def outdated(items: Iterable[tuple]) -> Iterator[tuple]:
+				for in_file, clip in items:
+					if self.isUpToDate(in_file, clip):
+						skipped[0] += 1
+					else:
+						yield in_file, clip
+			if isinstance(items, list):
+				total = len(items)
+				items = list(outdated(items))
+				if skipped[0]:
+					print(F"Skipping {skipped[0]} of {total} {what}, already encoded and unchanged (use --force to re-encode).")
+			else:
+				items = outdated(items)
+
+		# Files of a folder (or a single file) are all checked before the first one is encoded, so bad files show up right away
+		# and not halfway through a long batch. Recursive and watched folders check each file as it's encoded.
+		bad_jobs = []
+		if isinstance(items, list) and len(items):
+			bad_files = self.checkInputs(list(dict.fromkeys(in_file for in_file, _ in items)))
+			if bad_files:
+				if len(input_files) == 1:
+					print(next(iter(bad_files.values())))
+				else:
+					print(F"Can't encode {len(bad_files)} of {len(input_files)} file(s), skipping:")
+					print("\t- " + "\n\t- ".join(bad_files.values()))
+				for in_file, error in bad_files.items():
+					job = EncodeJob(in_file, 0, 0)
+					job.Error = error
+					bad_jobs.append(job)
+				items = [(in_file, clip) for in_file, clip in items if in_file not in bad_files]
+				if not len(items):
+					exit(1)
+
+		# Finished files are moved while the next ones are encoding, so with a slow (network) output path
+		# the total time is about whichever of the two takes longer, rather than both added up.
+		self.startTransfers()
+		started = time.time()
+
+		if isinstance(items, list):
+			jobs = [EncodeJob(in_file, i, len(items), clip) for i, (in_file, clip) in enumerate(items, 1)]
+		elif self.watch:
+			jobs = (EncodeJob(in_file, i, None, self.clip, (st.st_size, st.st_mtime_ns)) for i, (in_file, st) in enumerate(input_files, 1))
+		else:
+			# Recursive mode, jobs get created (and started) while the folders are still being walked.
+			jobs = (EncodeJob(in_file, i, None, clip) for i, (in_file, clip) in enumerate(items, 1))
+		jobs = self.runJobs(jobs) + bad_jobs
+		if self.probeCache:
+			self.probeCache.close()
+		if not isinstance(items, list) and skipped[0]:
+			print(F"Skipped {skipped[0]} {what}, already encoded and unchanged (use --force to re-encode).")
+		try:
+			self.finishTransfers()
+		except KeyboardInterrupt:
+			self.abortJobs(jobs)
+		failed_jobs = [job for job in jobs if job.Error]
+		share_links = []
+		if self.copyLink:
+			share_links = [self.baseUrl.format(file_name=output.name) for job in jobs if not job.Error for output in job.Outputs]
+
+		if self.manifest:
+			self.manifest.close()
+
+		if self.reportPath:
+			self.writeReport(jobs, started, Path(self.reportPath))
 
 		if len(share_links):
 			print(F"Copying URL(s) to clip-board: ")
 			print("\n\t- " + "\n\t- ".join(share_links))
 			pyperclip.copy(os.linesep.join(share_links))
 
+		if len(failed_jobs):
+			print(F"Failed to encode {len(failed_jobs)} of {len(jobs)} file(s):")
+			print("\t- " + "\n\t- ".join(F"{job.Input}: {job.Error.splitlines()[0]}" for job in failed_jobs))
+			exit(1)
+
+# Synthetic sources of the benchmark: name, lavfi source, sample rate, channels, length (relative to --benchmark seconds), embedded cover
+BENCHMARK_SOURCES = (
+	('sine_44k_stereo', 'sine=frequency=440', 44100, 2, 1.0, False),
+	('noise_48k_stereo_cover', 'anoisesrc=color=pink:amplitude=0.2', 48000, 2, 1.0, True),
+	('noise_96k_5.1', 'anoisesrc=color=white:amplitude=0.1', 96000, 6, 0.5, False),
+	('sine_22k_mono_short', 'sine=frequency=1000', 22050, 1, 0.1, True),
+)
+BENCHMARK_BITRATES = (64, 128)
+BENCHMARK_VBR = (True, False)
+BENCHMARK_JOBS = (1, 0) # 0 = one per CPU core
+
+def makeBenchmarkSources(folder: Path, seconds: int) -> List[Path]:
+	cover = folder.joinpath("cover.png")
+	sources_folder = folder.joinpath("sources") # Apart from cover.png, so it's not picked up as folder cover.
+	sources_folder.mkdir()
+	commands = [[
+		'ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error',
+		'-f', 'lavfi', '-i', 'testsrc=size=1000x1000', '-frames:v', '1', '-y', str(cover),
+	]]
+	sources = []
+	for name, lavfi, sample_rate, channels, length, with_cover in BENCHMARK_SOURCES:
+		source = sources_folder.joinpath(F"{name}.flac")
+		cmd = [
+			'ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error',
+			'-f', 'lavfi', '-i', F'{lavfi}:sample_rate={sample_rate}:duration={max(seconds * length, 1):.2f}',
+		]
+		if with_cover:
+			cmd.extend(['-i', str(cover), '-map', '0:a', '-map', '1:v', '-c:v', 'png', '-disposition:v', 'attached_pic', '-metadata:s:v', 'comment=Cover (front)'])
+		cmd.extend(['-af', F'aformat=channel_layouts={channels}c', '-c:a', 'flac', '-y', str(source)])
+		commands.append(cmd)
+		sources.append(source)
+	for cmd in commands:
+		try:
+			subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+		except subprocess.CalledProcessError as e:
+			print(e.output.decode("utf-8"))
+			print(F"Generating the benchmark sources failed, command was: {subprocess.list2cmdline(cmd)}")
+			exit(1)
+	return sources
+
+def childrenUsage() -> tuple:
+	'''CPU seconds used by all finished child processes so far, None where the platform can't tell.'''
+	try:
+		import resource
+	except ImportError:
+		return None
+	usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+	return usage.ru_utime + usage.ru_stime
+
+def runBenchmark(seconds: int, report_path: Path, **settings) -> None:
+	'''
+		Encodes a set of generated sources (ffmpeg lavfi, so no sample files are needed) with every combination
+		of engine, bitrate, VBR and number of jobs, prints the results and writes them to a JSON file.
+	'''
+	cpus = os.cpu_count() or 1
+	jobs_levels = sorted(set(x or cpus for x in BENCHMARK_JOBS))
+	runs = [(e, b, v, j) for e in OpusMaker.ENGINES for b in BENCHMARK_BITRATES for v in BENCHMARK_VBR for j in jobs_levels]
+	results = []
+	with tempfile.TemporaryDirectory(prefix="opus_benchmark_") as temp_dir:
+		print(F"Generating {len(BENCHMARK_SOURCES)} benchmark sources ({seconds}s)...")
+		sources = makeBenchmarkSources(Path(temp_dir), seconds)
+		print(F"Running {len(runs)} benchmarks, {len(sources)} files each...")
+		print(F"{'engine':<13}{'kbps':>5} {'vbr':<4}{'jobs':>4}{'files/s':>9}{'x realtime':>11}{'CPU':>7}{'peak RSS':>10}")
+		for engine, bitrate, vbr, jobs in runs:
+			maker = OpusMaker(None, engine=engine, bit_rate=bitrate, opus_vbr=vbr, jobs=jobs, quiet=True, **settings)
+			batch = [EncodeJob(source, i, len(sources)) for i, source in enumerate(sources, 1)]
+			cpu_before = childrenUsage()
+			started = time.time()
+			maker.runJobs(batch)
+			wall = time.time() - started
+			cpu_after = childrenUsage()
+			for job in batch:
+				for output in job.Outputs:
+					output.unlink(missing_ok=True)
+
+			done = [job for job in batch if job.Output]
+			audio_seconds = sum(job.Duration or 0 for job in done)
+			cpu_seconds = cpu_after - cpu_before if cpu_before is not None else sum(stage['cpu_seconds'] or 0 for job in done for stage in job.Stages)
+			peak_rss = max((stage['peak_rss_bytes'] or 0 for job in done for stage in job.Stages), default=0) or None
+			result = {
+				'engine': engine,
+				'bitrate': bitrate,
+				'vbr': vbr,
+				'jobs': jobs,
+				'files': len(batch),
+				'failed': len(batch) - len(done),
+				'errors': [job.Error.splitlines()[0] for job in batch if job.Error],
+				'audio_seconds': round(audio_seconds, 3),
+				'wall_seconds': round(wall, 3),
+				'files_per_second': round(len(done) / wall, 3),
+				'realtime_factor': round(audio_seconds / wall, 2),
+				'cpu_seconds': round(cpu_seconds, 3),
+				'cpu_utilisation': round(cpu_seconds / (wall * cpus), 3),
+				'peak_rss_bytes': peak_rss,
+			}
+			results.append(result)
+			print(
+				F"{engine:<13}{bitrate:>5} {'on' if vbr else 'off':<4}{jobs:>4}{result['files_per_second']:>9.2f}{result['realtime_factor']:>11.1f}"
+				+ F"{result['cpu_utilisation'] * 100:>6.0f}%{(peak_rss or 0) / 1048576:>8.1f}MB"
+				+ (F"  ({result['failed']} failed: {result['errors'][0]})" if result['failed'] else "")
+			)
+
+	report = {
+		'host': platform.node(),
+		'platform': platform.platform(),
+		'cpus': cpus,
+		'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'seconds': seconds,
+		'sources': [
+			{'name': name, 'sample_rate': sample_rate, 'channels': channels, 'seconds': max(seconds * length, 1), 'cover': with_cover}
+			for name, _, sample_rate, channels, length, with_cover in BENCHMARK_SOURCES
+		],
+		'results': results,
+	}
+	try:
+		with open(report_path, 'w', encoding='utf-8') as f:
+			json.dump(report, f, indent=4)
+		print(F"Wrote benchmark results to: {report_path}")
+	except OSError as e:
+		print(F"Writing the benchmark results to {report_path} failed: {e}")
+		exit(1)
+
 class Path(pathlib.Path): # Part of https://gist.github.com/DeadSix27/036810df93804d02b962c0aec8d08b59
 	_flavour = pathlib._windows_flavour if os.name == 'nt' else pathlib._posix_flavour
 
@@ -548,30 +2826,69 @@ if __name__ == "__main__":
 	except ImportError:
 		HAVE_PYPERCLIP = False
 
-	if len(sys.argv) >= 2:
-		input_path = sys.argv[1]
-		start_time = None
-		end_time = None
-		if len(sys.argv) == 3:
-			start_time = sys.argv[2]
-		elif len(sys.argv) >= 4:
-			start_time = sys.argv[2]
-			end_time = sys.argv[3]
-
-		OpusMaker(input_path, start_time, end_time,
-			output_dir=OUTPUT_PATH,
-			copy_link=COPY_SHARE_LINK,
-			base_url=BASE_URL,
-			opus_vbr=OPUS_VBR,
-			bit_rate=BITRATE,
-			with_cover=WITH_COVER,
-			have_mime=HAVE_MIME,
-			ignore_mime=IGNORE_MIME,
-			have_pyperclip=HAVE_PYPERCLIP,
-			batch_extensions=BATCH_EXTENSIONS,
-			overwrite_existing=OVERWRITE_EXISTING,
-			append_time=APPEND_TIME
+	parser = argparse.ArgumentParser(description='Simple opus encoder and share-helper')
+	parser.add_argument('input_path', help='File or folder (batch-encode) to encode', nargs='?', default=None)
+	parser.add_argument('start_time', help='Start of the range to encode, e.g 3:07', nargs='?', default=None)
+	parser.add_argument('end_time', help='End of the range to encode, e.g 3:15', nargs='?', default=None)
+	parser.add_argument('-j', '--jobs', help=F'How many files to encode at the same time, 0 = one per CPU core (Default: {JOBS})', type=int, dest='jobs', default=JOBS)
+	parser.add_argument('-e', '--engine', help=F'How to encode (Default: {ENCODE_ENGINE})', choices=OpusMaker.ENGINES, dest='engine', default=ENCODE_ENGINE)
+	parser.add_argument('-r', '--recursive', help=F'Also encode the files in all sub-folders, mirroring the folder structure in the output folder (Default: {RECURSIVE})', action='store_true', dest='recursive', default=RECURSIVE)
+	parser.add_argument('-f', '--force', help='Re-encode files the manifest lists as already encoded and unchanged', action='store_true', dest='force')
+	parser.add_argument('-s', '--split', help=F'Split a single long file into segments that are encoded in parallel, see --jobs (Default: {SPLIT_LONG_FILES})', action='store_true', dest='split', default=SPLIT_LONG_FILES)
+	parser.add_argument('--verify-split', help='Check split encodes against a normal encode', action='store_true', dest='verify_split', default=SPLIT_VERIFY)
+	parser.add_argument('--renditions', help='Encode into several bitrates at once from a single decode, comma separated, each optionally with :vbr or :cbr, e.g 48,64,128:cbr (Default: BITRATE only)', type=lambda value: parseRenditions(value, OPUS_VBR), dest='renditions', default=RENDITIONS, metavar='KBPS[:cbr],...')
+	parser.add_argument('-c', '--clip', help='Encode this clip of the file, e.g 3:07-3:15, can be given more than once, each clip gets its own output file', type=parseClip, action='append', dest='clips', metavar='START-END')
+	parser.add_argument('--clips', help='Encode every clip listed in this file, one per line like --clip', type=readClipList, dest='clip_list', metavar='FILE')
+	parser.add_argument('--report', help='Write a JSON report with the timings of every file to this path', dest='report', default=REPORT_PATH, metavar='PATH')
+	parser.add_argument('--benchmark', help='Benchmark every engine, bitrate, VBR and jobs combination on generated tracks of about this many seconds (Default: 60), writes the results to --report or opus_benchmark.json, and exit', type=int, nargs='?', const=60, default=None, metavar='SECONDS')
+	args = parser.parse_intermixed_args() # Options can also go after the input, e.g opus watch <folder> -j 0
+
+	if args.benchmark:
+		runBenchmark(args.benchmark, Path(args.report or "opus_benchmark.json"),
+			with_cover=True,
 		)
-	else:
-		print("Syntax: opus <file> [<start_time> [<end_time]]")
-		exit(1)
\ No newline at end of file
+		exit(0)
+
+	if not args.input_path:
+		parser.error("the following arguments are required: input_path")
+
+	# opus watch <folder>, unless there really is a file or folder called watch.
+	watch = args.input_path == 'watch' and args.start_time is not None and not os.path.exists(args.input_path)
+	if watch:
+		if args.end_time:
+			parser.error("watch takes just the folder to watch")
+		args.input_path, args.start_time = args.start_time, None
+
+	OpusMaker(args.input_path, args.start_time, args.end_time,
+		output_dir=OUTPUT_PATH,
+		copy_link=COPY_SHARE_LINK,
+		base_url=BASE_URL,
+		opus_vbr=OPUS_VBR,
+		bit_rate=BITRATE,
+		with_cover=WITH_COVER,
+		have_mime=HAVE_MIME,
+		ignore_mime=IGNORE_MIME,
+		have_pyperclip=HAVE_PYPERCLIP,
+		batch_extensions=BATCH_EXTENSIONS,
+		overwrite_existing=OVERWRITE_EXISTING,
+		append_time=APPEND_TIME,
+		jobs=args.jobs,
+		engine=args.engine,
+		probe_cache=PROBE_CACHE,
+		cover_cache=COVER_CACHE,
+		temp_path=TEMP_PATH,
+		use_manifest=USE_MANIFEST,
+		force=args.force,
+		recursive=args.recursive,
+		transfer_jobs=TRANSFER_JOBS,
+		progress_interval=PROGRESS_INTERVAL,
+		report_path=args.report,
+		split=args.split,
+		split_min_seconds=SPLIT_MIN_SEGMENT_SECONDS,
+		split_verify=args.verify_split,
+		renditions=args.renditions,
+		clips=(args.clips or []) + (args.clip_list or []),
+		watch=watch,
+		watch_interval=WATCH_INTERVAL,
+		watch_settle_seconds=WATCH_SETTLE_SECONDS,
+	)